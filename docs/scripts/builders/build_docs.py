@@ -84,8 +84,7 @@ class UniversalDocumentBuilder(DocumentBuilder):
         print(f"📄 Загрузка шаблона из: {self.template_path}")
         
         try:
-            with open(self.template_path, 'r', encoding='utf-8') as f:
-                self.template = yaml.safe_load(f)
+            self.template = GOSTSharedUtils.load_yaml_file(self.template_path)
         except Exception as e:
             print(f"❌ Ошибка загрузки шаблона: {e}")
             raise
@@ -117,10 +116,9 @@ class UniversalDocumentBuilder(DocumentBuilder):
             raise FileNotFoundError(f"Файл конфигурации не найден: {config_path}")
             
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f) or {}
-                print(f"✅ Конфигурация загружена из: {config_path}")
-                return config
+            config = GOSTSharedUtils.load_yaml_file(config_path) or {}
+            print(f"✅ Конфигурация загружена из: {config_path}")
+            return config
         except yaml.YAMLError as e:
             raise yaml.YAMLError(f"Ошибка парсинга YAML файла {config_path}: {e}")
 
@@ -180,7 +178,7 @@ class UniversalDocumentBuilder(DocumentBuilder):
         
         # Создание XML содержимого
         print("🔄 Создание XML содержимого...")
-        content_xml = self._create_content_xml(self.template)
+        content_xml = self._create_content_parts(self.template)
         
         # Получение метаданных
         metadata = self._get_metadata()
@@ -199,6 +197,12 @@ class UniversalDocumentBuilder(DocumentBuilder):
         """
         Создание XML содержимого документа.
         """
+        return '\n'.join(self._create_content_parts(template))
+
+    def _create_content_parts(self, template: dict) -> list:
+        """
+        Создание фрагментов XML содержимого (пишутся в архив без склейки).
+        """
         # Проверка инициализации процессоров
         if self.section_processor is None:
             raise RuntimeError("section_processor не инициализирован")
@@ -212,7 +216,7 @@ class UniversalDocumentBuilder(DocumentBuilder):
         # Создание структуры документа
         doc_structure = GOSTDocumentStructure(self.doc_type)
         
-        return doc_structure.create_content_structure(
+        return doc_structure.create_content_parts(
             template,
             self.section_processor,
             self.toc_generator,
@@ -7,12 +7,16 @@ build_site.py - Генерация high-tech сайта документации
 import os
 import sys
 import shutil
+import functools
 from pathlib import Path
 from datetime import datetime
 import yaml
 import io
 import jinja2
 from jinja2 import Template, UndefinedError
+from markupsafe import Markup
+
+from gost_shared import GOSTSharedUtils
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
@@ -147,8 +151,7 @@ def load_metadata():
     print(f"📖 Загружаю метаданные из: {meta_path}")
     
     try:
-        with open(meta_path, "r", encoding="utf-8") as f:
-            metadata = yaml.safe_load(f)
+        metadata = GOSTSharedUtils.load_yaml_file(meta_path)
         
         if not metadata:
             raise ValueError("Файл метаданных пуст")
@@ -174,9 +177,8 @@ def load_yaml(path: Path) -> dict:
         raise FileNotFoundError(f"Файл не найден: {path}")
     
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-            return data if isinstance(data, dict) else {}
+        data = GOSTSharedUtils.load_yaml_file(path)
+        return data if isinstance(data, dict) else {}
     except Exception as e:
         raise RuntimeError(f"Ошибка чтения YAML {path}: {e}")
 
@@ -195,120 +197,183 @@ def copy_media():
                 dest.parent.mkdir(parents=True, exist_ok=True)
                 shutil.copy2(item, dest)
 
+@functools.cache
+def list_pdf_files() -> tuple:
+    """Сканирует папку PDF один раз за сборку (лениво, при первом обращении)"""
+    pdf_folder = CONFIG["pdf_dir"]
+    if not (pdf_folder.exists() and pdf_folder.is_dir()):
+        return ()
+    return tuple(pdf_folder.glob("*.pdf"))
+
 def get_available_pdfs():
     """Автоматически находит все PDF-файлы"""
     available = []
-    pdf_folder = CONFIG["pdf_dir"]
     
-    if pdf_folder.exists() and pdf_folder.is_dir():
-        for pdf_file in pdf_folder.glob("*.pdf"):
-            name = pdf_file.stem
-            fname = pdf_file.name
-            available.append((name, fname))
-            print(f"✅ PDF: {name}")
+    for pdf_file in list_pdf_files():
+        name = pdf_file.stem
+        fname = pdf_file.name
+        available.append((name, fname))
+        print(f"✅ PDF: {name}")
     
     return available
 
+# Общее окружение для подстановки плейсхолдеров: шаблоны компилируются один раз
+_TEXT_ENV = jinja2.Environment(optimized=True, autoescape=False, auto_reload=False)
+
+@functools.lru_cache(maxsize=4096)
+def _compile_text(text: str) -> Template:
+    return _TEXT_ENV.from_string(text)
+
 def render_text(text: str, context: dict) -> str:
     """Подставляет placeholders {{ key }} из context"""
     if not text or not isinstance(text, str):
         return text
     try:
-        t = Template(text)
-        return t.render(**context)
+        return _compile_text(text).render(context)
     except UndefinedError:
         return text
     except Exception as e:
         print(f"Ошибка рендера текста: {e}")
         return text
 
-def simple_render_section(section: dict, level: int = 1, context: dict | None = None) -> str:
-    context = context or {}
-    html = []
-    
+# Обработчики элементов "content" (ключ - значение поля type)
+
+# Готовые серии <br> для типичного количества пустых строк
+_BR_CACHE = tuple("<br>" * i for i in range(16))
+
+def _newlines_to_br(text: str) -> str:
+    """Заменяет переводы строк на <br>, не трогая строки без них"""
+    return text.replace('\n', '<br>') if '\n' in text else text
+
+def _emit_content_text(block: dict, html: list, context: dict):
+    if "value" not in block:
+        return
+    # ФИКС: Используем переменную для замены символов
+    processed_text = _newlines_to_br(render_text(block["value"], context))
+    html.append(f"<p class='mb-4 text-gray-800 leading-relaxed'>{processed_text}</p>")
+
+def _emit_content_blank_line(block: dict, html: list, context: dict):
+    count = block.get("count", 1)
+    html.append(_BR_CACHE[count] if 0 <= count < len(_BR_CACHE) else "<br>" * count)
+
+def _emit_content_bottom_info(block: dict, html: list, context: dict):
+    if "value" not in block:
+        return
+    value = render_text(block["value"], context)
+    html.append(f"<p class='text-gray-800 mt-8'>{value}</p>")
+
+_CONTENT_HANDLERS = {
+    "text": _emit_content_text,
+    "blank_line": _emit_content_blank_line,
+    "bottom_info": _emit_content_bottom_info,
+}
+
+# Обработчики элементов "blocks" (ключ - имя поля блока, порядок важен)
+
+def _emit_block_text(block: dict, html: list, context: dict):
+    # ФИКС: Используем переменную
+    processed_text = _newlines_to_br(render_text(block["text"], context))
+    html.append(f"<p class='mb-4 text-gray-800'>{processed_text}</p>")
+
+def _emit_block_list(block: dict, html: list, context: dict):
+    if block["list"].get("style") == "no_bullet":
+        html.append("<ul class='list-none pl-0 mb-4 space-y-1'>")
+    elif block["list"].get("style") == "bullet":
+        html.append("<ul class='list-disc pl-6 mb-4 space-y-1'>")
+    else:
+        html.append("<ul class='list-decimal pl-6 mb-4 space-y-1'>")
+    for item in block["list"].get("items") or []:
+        html.append(f"<li>{render_text(item, context)}</li>")
+    html.append("</ul>")
+
+def _emit_block_table(block: dict, html: list, context: dict):
+    html.append("<div class='overflow-x-auto mb-6'><table class='w-full border-collapse'>")
+    html.append("<thead><tr class='bg-gray-800'>")
+    for h in block["table"].get("headers") or []:
+        html.append(f"<th class='border border-gray-700 p-3 text-left'>{render_text(h, context)}</th>")
+    html.append("</tr></thead><tbody>")
+    for row in block["table"].get("rows") or []:
+        html.append("<tr>")
+        for cell in row.get("cells") or []:
+            html.append(f"<td class='border border-gray-700 p-3'>{render_text(cell, context)}</td>")
+        html.append("</tr>")
+    html.append("</tbody></table></div>")
+
+def _emit_block_image(block: dict, html: list, context: dict):
+    path = block["image"].get("path", "").replace("docs/media/", "media/")
+    caption = render_text(block["image"].get("caption", ""), context)
+    width = block["image"].get("width", "auto")
+    html.append(f"<figure class='my-8'><img src='{path}' alt='{caption}' class='mx-auto rounded-lg shadow-lg' style='width:{width};' /><figcaption class='text-center text-gray-400 mt-3'>{caption}</figcaption></figure>")
+
+_BLOCK_HANDLERS = (
+    ("text", _emit_block_text),
+    ("list", _emit_block_list),
+    ("table", _emit_block_table),
+    ("image", _emit_block_image),
+)
+
+_HEADING_SIZE_CLASSES = {
+    1: "text-3xl",
+    2: "text-2xl",
+    3: "text-xl",
+    4: "text-lg",
+    5: "text-base",
+    6: "text-sm"
+}
+
+def _make_heading_template(level: int) -> str:
+    """Строит шаблон заголовка уровня level с местами под id и текст"""
+    size_class = _HEADING_SIZE_CLASSES.get(level, "text-base")
+    return f"<h{level} id='%s' class='{size_class} font-bold mt-8 mb-4 border-b border-blue-600 pb-2'>%s</h{level}>"
+
+# Шаблоны заголовков h1-h6 собираются один раз при импорте
+_HEADING_TEMPLATES = {level: _make_heading_template(level) for level in _HEADING_SIZE_CLASSES}
+
+def simple_render_section(section: dict, level: int, context: dict, html: list) -> None:
+    """Рендерит секцию и её потомков, дописывая HTML-фрагменты в общий список html"""
     if not isinstance(section, dict):
-        return ""
+        return
     
-    tag = f"h{level}"
     if "name" in section and section["name"].strip():
         name = render_text(section["name"], context)
         anchor = section.get("id", name.lower().replace(" ", "-").replace(".", ""))
-
-        size_classes = {
-            1: "text-3xl",
-            2: "text-2xl",
-            3: "text-xl",
-            4: "text-lg",
-            5: "text-base",
-            6: "text-sm"
-        }
         
-        size_class = size_classes.get(level, "text-base")
-        html.append(f"<{tag} id='{anchor}' class='{size_class} font-bold mt-8 mb-4 border-b border-blue-600 pb-2'>{name}</{tag}>")
+        heading = _HEADING_TEMPLATES.get(level) or _make_heading_template(level)
+        html.append(heading % (anchor, name))
 
     if "content" in section:
         for block in section.get("content") or []:
             if isinstance(block, dict):
-                if block.get("type") == "text" and "value" in block:
-                    text = render_text(block["value"], context)
-                    # ФИКС: Используем переменную для замены символов
-                    processed_text = text.replace('\n', '<br>')
-                    html.append(f"<p class='mb-4 text-gray-800 leading-relaxed'>{processed_text}</p>")
-                elif block.get("type") == "blank_line":
-                    html.append("<br>" * block.get("count", 1))
-                elif block.get("type") == "bottom_info" and "value" in block:
-                    value = render_text(block["value"], context)
-                    html.append(f"<p class='text-gray-800 mt-8'>{value}</p>")
+                handler = _CONTENT_HANDLERS.get(block.get("type"))
+                if handler:
+                    handler(block, html, context)
 
     if "blocks" in section:
         for block in section.get("blocks") or []:
             if isinstance(block, dict):
-                if "text" in block:
-                    text = render_text(block["text"], context)
-                    # ФИКС: Используем переменную
-                    processed_text = text.replace('\n', '<br>')
-                    html.append(f"<p class='mb-4 text-gray-800'>{processed_text}</p>")
-                elif "list" in block:
-                    if block["list"].get("style") == "no_bullet":
-                        html.append("<ul class='list-none pl-0 mb-4 space-y-1'>")
-                    elif block["list"].get("style") == "bullet":
-                        html.append("<ul class='list-disc pl-6 mb-4 space-y-1'>")
-                    else:
-                        html.append("<ul class='list-decimal pl-6 mb-4 space-y-1'>")
-                    for item in block["list"].get("items") or []:
-                        html.append(f"<li>{render_text(item, context)}</li>")
-                    html.append("</ul>")
-                elif "table" in block:
-                    html.append("<div class='overflow-x-auto mb-6'><table class='w-full border-collapse'>")
-                    html.append("<thead><tr class='bg-gray-800'>")
-                    for h in block["table"].get("headers") or []:
-                        html.append(f"<th class='border border-gray-700 p-3 text-left'>{render_text(h, context)}</th>")
-                    html.append("</tr></thead><tbody>")
-                    for row in block["table"].get("rows") or []:
-                        html.append("<tr>")
-                        for cell in row.get("cells") or []:
-                            html.append(f"<td class='border border-gray-700 p-3'>{render_text(cell, context)}</td>")
-                        html.append("</tr>")
-                    html.append("</tbody></table></div>")
-                elif "image" in block:
-                    path = block["image"].get("path", "").replace("docs/media/", "media/")
-                    caption = render_text(block["image"].get("caption", ""), context)
-                    width = block["image"].get("width", "auto")
-                    html.append(f"<figure class='my-8'><img src='{path}' alt='{caption}' class='mx-auto rounded-lg shadow-lg' style='width:{width};' /><figcaption class='text-center text-gray-400 mt-3'>{caption}</figcaption></figure>")
+                for key, handler in _BLOCK_HANDLERS:
+                    if key in block:
+                        handler(block, html, context)
+                        break
 
     # subsections - безопасно обрабатываем
     subsections = section.get("subsections")
     if subsections:
         for sub in subsections:
-            html.append(simple_render_section(sub, level + 1, context))
+            simple_render_section(sub, level + 1, context, html)
 
     # points - безопасно обрабатываем
     points = section.get("points")
     if points:
         for point in points:
-            html.append(simple_render_section(point, level + 1, context))
+            simple_render_section(point, level + 1, context, html)
 
-    return "\n".join(html)
+def render_content(sections: list, context: dict) -> Markup:
+    """Собирает HTML всех секций страницы одним join (доступна в шаблоне сайта)"""
+    html = []
+    for section in sections:
+        simple_render_section(section, 1, context, html)
+    return Markup("<div class='content'>" + "\n".join(html) + "</div>")
 
 def generate_toc(sections: list, context: dict) -> str:
     """Генерирует HTML-оглавление только с разделами верхнего уровня"""
@@ -342,6 +407,9 @@ def has_tag(section: dict, tag: str) -> bool:
         return tag in tags
     return False
 
+# Служебные секции документа, которые не выводятся на сайт
+_SERVICE_SECTION_IDS = frozenset(("title_page", "table_of_contents"))
+
 def filter_sections_by_tag(sections: list, target_tag: str, preserve_structure: bool = False):
     """
     Фильтрует секции по тегу.
@@ -359,7 +427,7 @@ def filter_sections_by_tag(sections: list, target_tag: str, preserve_structure:
             
         section_id = section.get("id", "")
         
-        if section_id in ["title_page", "table_of_contents"]:
+        if section_id in _SERVICE_SECTION_IDS:
             continue
         
         section_tags = section.get("site", [])
@@ -413,7 +481,7 @@ def copy_pdfs_to_web():
     pdf_dest.mkdir(parents=True, exist_ok=True)
     
     # Копируем PDF файлы
-    pdf_files = list(pdf_source.glob("*.pdf"))
+    pdf_files = list_pdf_files()
     if not pdf_files:
         print(f"⚠️ PDF файлы не найдены в: {pdf_source}")
         return False
@@ -500,21 +568,26 @@ def build_site():
         print("\n🎭 ЗАГРУЗКА ШАБЛОНОВ")
         env = jinja2.Environment(
             loader=jinja2.FileSystemLoader(CONFIG["templates_dir"]),
-            autoescape=True,
+            autoescape=jinja2.select_autoescape(["html", "xml"]),
         )
+        # Секции рендерятся прямо во время рендера шаблона страницы
+        env.globals["render_content"] = render_content
         
         template = env.get_template("site_template.html")
         print("✅ Шаблон сайта загружен")
         
+        # Отрендеренные страницы (путь, байты) - записываются пакетом в конце
+        pages = []
+        
         print("\n🏠 ГЕНЕРАЦИЯ ГЛАВНОЙ СТРАНИЦЫ")
         index_ctx = context.copy()
         index_ctx.update({
             "title": "Документация САСП-2",
             "page_id": "index",
-            "toc": "",
-            "content": ""  # Пустой контент - всё будет в шаблоне
+            "toc": Markup(""),
+            "content": Markup("")  # Пустой контент - всё будет в шаблоне
         })
-        render_page(template, index_ctx, CONFIG["web_output"] / "index.html")
+        pages.append((CONFIG["web_output"] / "index.html", render_page(template, index_ctx)))
         print("✅ Главная страница сгенерирована")
         
         print("\n📘 ГЕНЕРАЦИЯ РУКОВОДСТВА ПОЛЬЗОВАТЕЛЯ (r)")
@@ -525,12 +598,11 @@ def build_site():
         user_ctx.update({
             "title": "Руководство пользователя",
             "page_id": "user_guide",
-            "toc": generate_toc(user_sections, context),
-            "content": "<div class='content'>" + 
-                      "\n".join(simple_render_section(s, context=context) for s in user_sections) + 
-                      "</div>"
+            "toc": Markup(generate_toc(user_sections, context)),
+            "sections": user_sections,
+            "text_context": context
         })
-        render_page(template, user_ctx, CONFIG["web_output"] / "user_guide.html")
+        pages.append((CONFIG["web_output"] / "user_guide.html", render_page(template, user_ctx)))
         print(f"✅ Руководство пользователя: {len(user_sections)} разделов")
         
         print("\n🔧 ГЕНЕРАЦИЯ РУКОВОДСТВА ПО ОБСЛУЖИВАНИЮ (m)")
@@ -540,12 +612,11 @@ def build_site():
         maint_ctx.update({
             "title": "Руководство по обслуживанию",
             "page_id": "maintenance",
-            "toc": generate_toc(maint_sections, context),
-            "content": "<div class='content'>" + 
-                      "\n".join(simple_render_section(s, context=context) for s in maint_sections) + 
-                      "</div>"
+            "toc": Markup(generate_toc(maint_sections, context)),
+            "sections": maint_sections,
+            "text_context": context
         })
-        render_page(template, maint_ctx, CONFIG["web_output"] / "maintenance.html")
+        pages.append((CONFIG["web_output"] / "maintenance.html", render_page(template, maint_ctx)))
         print(f"✅ Руководство по обслуживанию: {len(maint_sections)} разделов")
         
         print("\n🔌 ГЕНЕРАЦИЯ РАЗРАБОТЧИКАМ")
@@ -554,12 +625,11 @@ def build_site():
         api_ctx.update({
             "title": "Разработчикам",
             "page_id": "api",
-            "toc": generate_toc(api_sections, context),
-            "content": "<div class='content'>" + 
-                      "\n".join(simple_render_section(s, context=context) for s in api_sections) + 
-                      "</div>"
+            "toc": Markup(generate_toc(api_sections, context)),
+            "sections": api_sections,
+            "text_context": context
         })
-        render_page(template, api_ctx, CONFIG["web_output"] / "api.html")
+        pages.append((CONFIG["web_output"] / "api.html", render_page(template, api_ctx)))
         print(f"✅ Разработчикам: {len(api_sections)} разделов")
         
         print("\n📄 ГЕНЕРАЦИЯ СТРАНИЦЫ PDF ДОКУМЕНТОВ")
@@ -613,12 +683,15 @@ def build_site():
         pdf_ctx.update({
             "title": "ГОСТ / Нормативные документы",
             "page_id": "standards",
-            "toc": "",
-            "content": pdf_content
+            "toc": Markup(""),
+            "content": Markup(pdf_content)
         })
-        render_page(template, pdf_ctx, CONFIG["web_output"] / "standards.html")
+        pages.append((CONFIG["web_output"] / "standards.html", render_page(template, pdf_ctx)))
         print("✅ Страница PDF документов сгенерирована")
         
+        write_pages(pages)
+        print(f"💾 Записано страниц: {len(pages)}")
+        
         print("\n" + "=" * 60)
         print("✅ САЙТ УСПЕШНО СГЕНЕРИРОВАН")
         print("=" * 60)
@@ -651,9 +724,14 @@ def build_site():
         print("\n🛑 ПРЕРЫВАЮ ВЫПОЛНЕНИЕ")
         raise
 
-def render_page(template, context, path: Path):
-    html = template.render(**context)
-    path.write_text(html, encoding="utf-8")
+def render_page(template, context) -> bytes:
+    """Рендерит страницу в байты UTF-8"""
+    return template.render(**context).encode("utf-8")
+
+def write_pages(pages: list) -> None:
+    """Записывает отрендеренные страницы (web_output очищается перед сборкой)"""
+    for path, data in pages:
+        path.write_bytes(data)
 
 if __name__ == "__main__":
     try:
@@ -2,231 +2,89 @@
 Полный набор общих компонентов для генерации ГОСТ документов.
 Включает форматтер, обработку данных и DocumentBuilder.
 
+Неочевидные решения по скорости (замеры - в истории коммитов):
+    - escape_xml - цепочка replace, а не str.translate (медленнее в разы);
+    - XML собирается списком фрагментов и склеивается одним join;
+    - разделы обходятся последовательно: счетчики таблиц/рисунков,
+      плейсхолдеры и записи оглавления сквозные для всего документа.
+
 """
 import sys
 import re
+import logging
+import functools
+import string
 import yaml
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Callable, Tuple
+from typing import Dict, List, Any, Optional, Callable, Set, Tuple, Union
 from datetime import datetime
-import tempfile
 import zipfile
-import shutil  
 import hashlib
+import io
+import json
+import os
+import struct
+import copy
 from collections import defaultdict
+from itertools import takewhile
+from importlib.util import find_spec
+
+# Отладочный вывод сборки ODT (по умолчанию выключен)
+logger = logging.getLogger(__name__)
+
+# libyaml-загрузчик в разы быстрее чистого Python, если PyYAML собран с ним
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# PIL нужен только для форматов без разбора заголовка (TIFF и т.п.), а его
+# импорт стоит ~30 мс - проверяем наличие сразу, импортируем по требованию
+_HAS_PIL = find_spec('PIL') is not None
+
+# lxml (libxml2) проверяет content.xml на корректность в отладочном режиме;
+# сам документ собирается строками - так быстрее и без обязательной зависимости
+_HAS_LXML = find_spec('lxml') is not None
 
 
 # ============================================================================
 # ГОСТ ФОРМАТТЕР 
 # ============================================================================
 
-class GOSTFormatter:
-    """Форматирование документов по ГОСТ Р 2.105-2019."""
-    
-    # Константы стилей
-    FONT_FAMILY = "FreeSerif"
-    FONT_SIZE = "14pt"
-    LINE_HEIGHT = "100%"  # Межстрочный интервал 1
-    
-    # Новые переменные для отступов и полей
-    PARAGRAPH_INDENT = "1.2cm"      # Абзацный отступ (красная строка)
-    PARAGRAPH_MARGIN_TOP = "0cm"    # Отступ сверху абзаца
-    PARAGRAPH_MARGIN_BOTTOM = "0cm" # Отступ снизу абзаца
-    
-    # Поля страницы по ГОСТ 2.105-2019
-    PAGE_WIDTH = "21.0cm"           # Ширина страницы А4
-    PAGE_HEIGHT = "29.7cm"          # Высота страницы А4
-    PAGE_MARGIN_TOP = "1.5cm"       # Верхнее поле
-    PAGE_MARGIN_BOTTOM = "2.0cm"    # Нижнее поле
-    PAGE_MARGIN_LEFT = "3.0cm"      # Левое поле (для подшивки)
-    PAGE_MARGIN_RIGHT = "1.5cm"     # Правое поле
-    
-    # Расчетные значения
-    @classmethod
-    def get_available_width(cls):
-        """Возвращает доступную ширину текста между полями."""
-        # 21см - 2см слева - 1см справа = 18см
-        left = float(cls.PAGE_MARGIN_LEFT.replace('cm', ''))
-        right = float(cls.PAGE_MARGIN_RIGHT.replace('cm', ''))
-        width = float(cls.PAGE_WIDTH.replace('cm', ''))
-        available = width - left - right
-        return f"{available:.1f}cm"
-    
-    @classmethod
-    def get_toc_tab_position(cls):
-        """Возвращает позицию табуляции для содержания."""
-        # Позиция табуляции = ширина страницы - правое поле
-        width = float(cls.PAGE_WIDTH.replace('cm', ''))
-        right_margin = float(cls.PAGE_MARGIN_RIGHT.replace('cm', ''))
-        
-        # Два варианта:
-        # 1. Табуляция до самого правого края (учитывая только правое поле)
-        position = width - right_margin
-        # 2. Или с небольшим отступом от правого края
-        # position = width - right_margin - 0.5  # минус 0.5см
-        
-        return f"{position:.1f}cm"
-    
-    @classmethod
-    def get_toc_left_indent(cls):
-        """Возвращает левый отступ для содержания."""
-        # Обычно такой же как у обычного текста (левое поле + абзацный отступ)
-        left_margin = float(cls.PAGE_MARGIN_LEFT.replace('cm', ''))
-        paragraph_indent = float(cls.PARAGRAPH_INDENT.replace('cm', ''))
-        indent = left_margin + paragraph_indent
-        return f"{indent:.1f}cm"
-    
-    @classmethod
-    def get_table_width(cls):
-        """Возвращает ширину таблицы."""
-        # Ширина таблицы = доступная ширина между полями
-        available = float(cls.get_available_width().replace('cm', ''))
-        return f"{available:.1f}cm"
-    
-    @classmethod
-    def get_table_column_width(cls, num_columns: int = 3):
-        """Возвращает ширину столбца таблицы для заданного количества столбцов."""
-        if num_columns <= 0:
-            return "5.6cm"  # значение по умолчанию
-        
-        available = float(cls.get_available_width().replace('cm', ''))
-        # Минус небольшие отступы между столбцами
-        column_width = (available - 0.5) / num_columns
-        return f"{max(column_width, 2.0):.1f}cm"  # не менее 2см
-    
-    # Буквы для подпунктов по ГОСТ
-    SUBCLAUSE_LETTERS = ['а', 'б', 'в', 'г', 'д', 'е', 'ж', 'з', 'и', 'к', 
-                        'л', 'м', 'н', 'о', 'п', 'р', 'с', 'т', 'у', 'ф', 
-                        'х', 'ц', 'ч', 'ш', 'щ', 'э', 'ю', 'я']
-    
-    @staticmethod
-    def format_number(level_counts: List[int]) -> str:
-        """Форматирует номер на основе счетчиков уровней."""
-        parts = []
-        for count in level_counts:
-            if count > 0:
-                parts.append(str(count))
-            else:
-                break
-        return ".".join(parts) if parts else ""
-    
-    @classmethod
-    def get_subclause_letter(cls, index: int) -> str:
-        """Возвращает букву для подпункта."""
-        if 0 <= index < len(cls.SUBCLAUSE_LETTERS):
-            return cls.SUBCLAUSE_LETTERS[index]
-        return f"[{index + 1}]"
-    
-    @classmethod
-    def format_subclause(cls, text: str, index: int, is_last: bool = False) -> str:
-        """Форматирует подпункт: а) текст;"""
-        letter = cls.get_subclause_letter(index)
-        
-        # НЕ убираем знаки препинания в конце текста!
-        text = text.strip()
-        
-        # Проверяем, есть ли знак препинания в конце
-        # Если нет - добавляем правильный знак препинания
-        if not text or text[-1] not in ';.:':
-            # Для последнего пункта - точка, для остальных - точка с запятой
-            delimiter = "." if is_last else ";"
-            return f"{letter}) {text}{delimiter}"
-        else:
-            # Если знак препинания уже есть - оставляем как есть
-            return f"{letter}) {text}"
-    
-    @classmethod
-    def format_list_item(cls, item_text: str, index: int, style: str, is_last: bool = False) -> str:
-        """Форматирует элемент списка в зависимости от стиля."""
-        item_text = item_text.strip()
-        
-        if style == 'no_bullet':
-            # Без дефисов и без нумерации - просто текст
-            # Убираем лишние знаки препинания, если они уже есть
-            if item_text and item_text[-1] not in ';.:':
-                return f"{item_text}."
-            return item_text
-        
-        elif style == 'alpha':
-            # а), б), в)
-            letter = cls.get_subclause_letter(index)
-            if not item_text or item_text[-1] not in ';.:':
-                delimiter = "." if is_last else ";"
-                return f"{letter}) {item_text}{delimiter}"
-            else:
-                return f"{letter}) {item_text}"
-        
-        elif style == 'numeric':
-            # 1), 2), 3)
-            number = index + 1
-            if not item_text or item_text[-1] not in ';.:':
-                delimiter = "." if is_last else ";"
-                return f"{number}) {item_text}{delimiter}"
-            else:
-                return f"{number}) {item_text}"
-        
-        elif style == 'roman':
-            # I), II), III)
-            roman_numerals = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X']
-            numeral = roman_numerals[index] if index < len(roman_numerals) else f"[{index + 1}]"
-            if not item_text or item_text[-1] not in ';.:':
-                delimiter = "." if is_last else ";"
-                return f"{numeral}) {item_text}{delimiter}"
-            else:
-                return f"{numeral}) {item_text}"
-        
-        elif style == 'bullet':
-            # – текст
-            if not item_text or item_text[-1] not in ';.:':
-                delimiter = "." if is_last else ";"
-                return f"– {item_text}{delimiter}"
-            else:
-                return f"– {item_text}"
-        
-        else:
-            # По умолчанию как bullet
-            if not item_text or item_text[-1] not in ';.:':
-                delimiter = "." if is_last else ";"
-                return f"– {item_text}{delimiter}"
-            else:
-                return f"– {item_text}"
-    
-    @classmethod
-    def get_level_style(cls, level: int) -> str:
-        """Возвращает стиль для заданного уровня вложенности.
-        
-        Args:
-            level: Уровень вложенности (0 - раздел, 1 - подраздел, 2 - пункт, 3 - подпункт)
-        
-        Returns:
-            Имя стиля для использования в XML
-        """
-        if level == 0:
-            return "Heading_20_1"      # Раздел 1
-        elif level == 1:
-            return "Heading_20_2"      # 1.1 Подраздел
-        elif level == 2:
-            return "Clause"            # 1.1.1 Пункт
-        elif level == 3:
-            return "Subclause"         # а) Подпункт
-        else:
-            # Для более глубоких уровней используем Normal с отступами
-            return "Normal"
 
-    @classmethod
-    def get_styles_xml(cls) -> str:
-        """Возвращает XML для автоматических стилей (content.xml)."""
-        # Вычисляем значения на основе переменных
-        toc_tab_position = cls.get_toc_tab_position()      # e.g., "20.0cm" (21см - 1см)
-        toc_left_indent = cls.get_toc_left_indent()        # e.g., "3.5cm" (2см + 1.5см)
-        table_width = cls.get_table_width()               # e.g., "18.0cm"
-        table_column_width = cls.get_table_column_width(3) # e.g., "5.8cm" для 3 столбцов
-        
-        return f'''    <!-- Стили по ГОСТ Р 2.105-2019 -->
+def _dotted(numbers: Tuple[int, ...]) -> str:
+    """Номер вида "1.2.3" по кортежу; 1-3 уровня собираются f-строкой без join."""
+    count = len(numbers)
+    if count == 1:
+        return str(numbers[0])
+    if count == 2:
+        return f"{numbers[0]}.{numbers[1]}"
+    if count == 3:
+        return f"{numbers[0]}.{numbers[1]}.{numbers[2]}"
+    return ".".join(map(str, numbers))
+
+# Знаки препинания, которыми может заканчиваться элемент списка
+_TAIL_PUNCT = frozenset(';.:')
+
+# Римские номера для списков стиля 'roman'
+_ROMAN_NUMERALS = ('I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X')
+
+
+def _roman_numeral(index: int) -> str:
+    """Возвращает римский номер для элемента списка: 0 -> 'I'."""
+    return _ROMAN_NUMERALS[index] if index < len(_ROMAN_NUMERALS) else f"[{index + 1}]"
+
+
+# Стили строк оглавления по уровням; уровни глубже последнего используют его стиль
+_TOC_STYLES: Tuple[str, ...] = ('TOC', 'TOC2', 'TOC3', 'TOC4')
+
+
+# Шаблон автоматических стилей content.xml; значения подставляются в get_styles_xml
+_STYLES_XML_TEMPLATE = string.Template('''    <!-- Стили по ГОСТ Р 2.105-2019 -->
             <!-- Стили титульного листа -->
             <style:style style:name="TitleCompany" style:family="paragraph">
-            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="{cls.LINE_HEIGHT}"/>
-            <style:text-properties fo:font-family="{cls.FONT_FAMILY}" fo:font-size="14pt"/>
+            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="${LINE_HEIGHT}"/>
+            <style:text-properties fo:font-family="${FONT_FAMILY}" fo:font-size="14pt"/>
             </style:style>
             
             <style:style style:name="TitleRight" style:family="paragraph">
@@ -234,11 +92,11 @@ class GOSTFormatter:
                 fo:text-align="right" 
                 fo:margin-top="0cm" 
                 fo:margin-bottom="0cm" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
+                fo:line-height="${LINE_HEIGHT}" 
                 fo:margin-right="0cm"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
 
             <style:style style:name="TitleLeft" style:family="paragraph">
@@ -246,21 +104,21 @@ class GOSTFormatter:
                 fo:text-align="left" 
                 fo:margin-top="0cm" 
                 fo:margin-bottom="0cm" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
+                fo:line-height="${LINE_HEIGHT}" 
                 fo:margin-right="0cm"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <style:style style:name="TitlePage" style:family="paragraph">
-            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="{cls.LINE_HEIGHT}"/>
-            <style:text-properties fo:font-family="{cls.FONT_FAMILY}" fo:font-size="{cls.FONT_SIZE}"/>
+            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="${LINE_HEIGHT}"/>
+            <style:text-properties fo:font-family="${FONT_FAMILY}" fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <style:style style:name="TitleBottom" style:family="paragraph">
-            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="{cls.LINE_HEIGHT}"/>
-            <style:text-properties fo:font-family="{cls.FONT_FAMILY}" fo:font-size="{cls.FONT_SIZE}"/>
+            <style:paragraph-properties fo:text-align="center" fo:margin-top="0cm" fo:margin-bottom="0cm" fo:line-height="${LINE_HEIGHT}"/>
+            <style:text-properties fo:font-family="${FONT_FAMILY}" fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Основные стили документа -->
@@ -268,14 +126,14 @@ class GOSTFormatter:
             <style:style style:name="Heading_20_1" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" 
                 fo:font-weight="bold"/>
             </style:style>
             
@@ -283,14 +141,14 @@ class GOSTFormatter:
             <style:style style:name="Heading_20_2" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" 
                 fo:font-weight="bold"/>
             </style:style>
             
@@ -298,57 +156,57 @@ class GOSTFormatter:
             <style:style style:name="Normal" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Стиль для введения -->
             <style:style style:name="Intro" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Пункты (1.1.1) -->
             <style:style style:name="Clause" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}"
+                fo:font-family="${FONT_FAMILY}"
                 fo:font-weight="normal" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Подпункты (а), б)) -->
             <style:style style:name="Subclause" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="justify" 
-                fo:margin-top="{cls.PARAGRAPH_MARGIN_TOP}" 
-                fo:margin-bottom="{cls.PARAGRAPH_MARGIN_BOTTOM}" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
-                fo:text-indent="{cls.PARAGRAPH_INDENT}" 
+                fo:margin-top="${PARAGRAPH_MARGIN_TOP}" 
+                fo:margin-bottom="${PARAGRAPH_MARGIN_BOTTOM}" 
+                fo:line-height="${LINE_HEIGHT}" 
+                fo:text-indent="${PARAGRAPH_INDENT}" 
                 style:contextual-spacing="true"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Заголовок таблицы -->
@@ -357,10 +215,10 @@ class GOSTFormatter:
                 fo:text-align="left" 
                 fo:margin-top="0.3cm" 
                 fo:margin-bottom="0.1cm" 
-                fo:line-height="{cls.LINE_HEIGHT}"/>
+                fo:line-height="${LINE_HEIGHT}"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Ячейки таблицы -->
@@ -371,11 +229,11 @@ class GOSTFormatter:
                 fo:margin-bottom="0.1cm" 
                 fo:margin-left="0.1cm"
                 fo:margin-right="0.1cm"
-                fo:line-height="{cls.LINE_HEIGHT}" 
+                fo:line-height="${LINE_HEIGHT}" 
                 fo:text-indent="0cm"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
             
             <!-- Заголовки столбцов таблицы -->
@@ -384,11 +242,11 @@ class GOSTFormatter:
                 fo:text-align="center" 
                 fo:margin-top="0.1cm" 
                 fo:margin-bottom="0.1cm" 
-                fo:line-height="{cls.LINE_HEIGHT}" 
+                fo:line-height="${LINE_HEIGHT}" 
                 fo:text-indent="0cm"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" 
                 fo:font-weight="bold"/>
             </style:style>
             
@@ -401,26 +259,26 @@ class GOSTFormatter:
                 fo:line-height="100%" 
                 fo:text-indent="0cm"
                 fo:margin-left="0cm">
-                fo:margin-left="{toc_left_indent}">  <!-- Используем вычисленный отступ -->
+                fo:margin-left="${TOC_LEFT_INDENT}">  <!-- Используем вычисленный отступ -->
                 <style:tab-stops>
-                <style:tab-stop style:position="{toc_tab_position}" style:type="right" style:leader-style="dotted" style:leader-text="."/>
+                <style:tab-stop style:position="${TOC_TAB_POSITION}" style:type="right" style:leader-style="dotted" style:leader-text="."/>
                 </style:tab-stops>
             </style:paragraph-properties>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}"/>
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
             </style:style>
-            
+            ${TOC_LEVEL_STYLES}
             <!-- Заголовок содержания -->
             <style:style style:name="TOCTitle" style:family="paragraph">
             <style:paragraph-properties 
                 fo:text-align="center" 
                 fo:margin-top="0cm" 
                 fo:margin-bottom="0.5cm" 
-                fo:line-height="{cls.LINE_HEIGHT}"/>
+                fo:line-height="${LINE_HEIGHT}"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" 
                 fo:font-weight="bold"/>
             </style:style>
             
@@ -439,7 +297,7 @@ class GOSTFormatter:
             <style:style style:name="Table" style:family="table">
             <style:table-properties 
                 table:align="margins" 
-                style:width="{table_width}" 
+                style:width="${TABLE_WIDTH}" 
                 fo:margin-top="0.2cm" 
                 fo:margin-bottom="0.2cm"
                 style:border-model="collapsing"/>
@@ -448,7 +306,7 @@ class GOSTFormatter:
             <!-- Стиль столбцов таблицы (адаптивная ширина) -->
             <style:style style:name="TableColumn" style:family="table-column">
             <style:table-column-properties 
-                style:column-width="{table_column_width}"/>
+                style:column-width="${TABLE_COLUMN_WIDTH}"/>
             </style:style>
             
             <!-- Стиль строк таблицы -->
@@ -513,8 +371,8 @@ class GOSTFormatter:
                 fo:margin-bottom="0.2cm" 
                 fo:line-height="100%"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" />
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" />
             </style:style>
             
             <!-- Стиль для центрированной подписи изображений -->
@@ -526,15 +384,396 @@ class GOSTFormatter:
                 fo:line-height="100%"
                 fo:text-indent="0cm"/>
             <style:text-properties 
-                fo:font-family="{cls.FONT_FAMILY}" 
-                fo:font-size="{cls.FONT_SIZE}" 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}" 
                 />
-        </style:style>'''
+        </style:style>''')
+
+
+# Стиль строки оглавления вложенного уровня: отличается от TOC только левым отступом
+_TOC_LEVEL_STYLE_TEMPLATE = string.Template('''
+            <style:style style:name="${STYLE_NAME}" style:family="paragraph">
+            <style:paragraph-properties 
+                fo:text-align="start" 
+                fo:margin-top="0cm" 
+                fo:margin-bottom="0cm" 
+                fo:line-height="100%" 
+                fo:text-indent="0cm"
+                fo:margin-left="${MARGIN_LEFT}">
+                <style:tab-stops>
+                <style:tab-stop style:position="${TOC_TAB_POSITION}" style:type="right" style:leader-style="dotted" style:leader-text="."/>
+                </style:tab-stops>
+            </style:paragraph-properties>
+            <style:text-properties 
+                fo:font-family="${FONT_FAMILY}" 
+                fo:font-size="${FONT_SIZE}"/>
+            </style:style>
+''')
+
+
+def _cm(value: float) -> str:
+    """Форматирует размер в сантиметрах для XML: 21.0 -> '21.0cm'."""
+    return f"{value:.1f}cm"
+
+
+def _cm_value(size: str) -> float:
+    """Размер в сантиметрах из строки XML: '21.0cm' -> 21.0."""
+    return float(size.replace('cm', ''))
+
+
+class GOSTFormatter:
+    """Форматирование документов по ГОСТ Р 2.105-2019."""
+    
+    # Константы стилей
+    FONT_FAMILY = "FreeSerif"
+    FONT_SIZE = "14pt"
+    LINE_HEIGHT = "100%"  # Межстрочный интервал 1
+    
+    _TOC_LEVEL_INDENT_CM = 0.5  # Отступ на уровень оглавления (~4 пробела при 14pt)
+    
+    # Новые переменные для отступов и полей
+    PARAGRAPH_INDENT = "1.2cm"      # Абзацный отступ (красная строка)
+    PARAGRAPH_MARGIN_TOP = "0cm"    # Отступ сверху абзаца
+    PARAGRAPH_MARGIN_BOTTOM = "0cm" # Отступ снизу абзаца
+    
+    # Поля страницы по ГОСТ 2.105-2019. Это единственный источник размеров:
+    # styles.xml берет их как есть, расчетные ширины ниже разбирают их один раз
+    # (методы кэшируются), поэтому переопределение в наследнике меняет и то и другое
+    PAGE_WIDTH = "21.0cm"           # Ширина страницы А4
+    PAGE_HEIGHT = "29.7cm"          # Высота страницы А4
+    PAGE_MARGIN_TOP = "1.5cm"       # Верхнее поле
+    PAGE_MARGIN_BOTTOM = "2.0cm"    # Нижнее поле
+    PAGE_MARGIN_LEFT = "3.0cm"      # Левое поле (для подшивки)
+    PAGE_MARGIN_RIGHT = "1.5cm"     # Правое поле
+    
+    # Расчетные значения
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_available_width(cls):
+        """Возвращает доступную ширину текста между полями."""
+        return _cm(_cm_value(cls.PAGE_WIDTH) - _cm_value(cls.PAGE_MARGIN_LEFT) - _cm_value(cls.PAGE_MARGIN_RIGHT))
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_toc_tab_position(cls):
+        """Возвращает позицию табуляции для содержания."""
+        # Позиция табуляции = ширина страницы - правое поле
+        # (вариант с отступом от правого края: ещё минус 0.5см)
+        return _cm(_cm_value(cls.PAGE_WIDTH) - _cm_value(cls.PAGE_MARGIN_RIGHT))
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_toc_left_indent(cls):
+        """Возвращает левый отступ для содержания."""
+        # Обычно такой же как у обычного текста (левое поле + абзацный отступ)
+        return _cm(_cm_value(cls.PAGE_MARGIN_LEFT) + _cm_value(cls.PARAGRAPH_INDENT))
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_table_width(cls):
+        """Возвращает ширину таблицы."""
+        # Ширина таблицы = доступная ширина между полями
+        return cls.get_available_width()
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_table_column_width(cls, num_columns: int = 3):
+        """Возвращает ширину столбца таблицы для заданного количества столбцов."""
+        if num_columns <= 0:
+            return "5.6cm"  # значение по умолчанию
+        
+        available = _cm_value(cls.get_available_width())
+        # Минус небольшие отступы между столбцами
+        column_width = (available - 0.5) / num_columns
+        return _cm(max(column_width, 2.0))  # не менее 2см
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_toc_level_styles_xml(cls) -> str:
+        """Возвращает стили строк оглавления вложенных уровней (TOC2, TOC3...)."""
+        # Позиция табуляции отсчитывается от левого отступа абзаца,
+        # поэтому уменьшается на отступ уровня: номера страниц остаются на месте
+        tab_position_cm = _cm_value(cls.get_toc_tab_position())
+        return "".join(
+            _TOC_LEVEL_STYLE_TEMPLATE.substitute(
+                STYLE_NAME=style_name,
+                MARGIN_LEFT=_cm(level * cls._TOC_LEVEL_INDENT_CM),
+                TOC_TAB_POSITION=_cm(tab_position_cm - level * cls._TOC_LEVEL_INDENT_CM),
+                FONT_FAMILY=cls.FONT_FAMILY,
+                FONT_SIZE=cls.FONT_SIZE,
+            )
+            for level, style_name in enumerate(_TOC_STYLES)
+            if level > 0
+        )
+    
+    # Методы выше и get_styles_xml кэшируются: значения зависят только от констант класса
+    _CACHED_METHODS = ('get_available_width', 'get_toc_tab_position', 'get_toc_left_indent',
+                       'get_table_width', 'get_table_column_width', 'get_toc_level_styles_xml',
+                       'get_styles_xml')
+    
+    @classmethod
+    def invalidate_cache(cls):
+        """Сбрасывает кэш вычисленных значений (нужно после изменения констант)."""
+        for name in cls._CACHED_METHODS:
+            getattr(cls, name).cache_clear()
+    
+    # Буквы для подпунктов по ГОСТ
+    SUBCLAUSE_LETTERS = ('а', 'б', 'в', 'г', 'д', 'е', 'ж', 'з', 'и', 'к', 
+                         'л', 'м', 'н', 'о', 'п', 'р', 'с', 'т', 'у', 'ф', 
+                         'х', 'ц', 'ч', 'ш', 'щ', 'э', 'ю', 'я')
+    
+    @staticmethod
+    def format_number(level_counts: List[int]) -> str:
+        """Форматирует номер на основе счетчиков уровней."""
+        # Берем счетчики до первого нулевого уровня
+        return _dotted(tuple(takewhile(lambda c: c > 0, level_counts)))
+    
+    @classmethod
+    def get_subclause_letter(cls, index: int) -> str:
+        """Возвращает букву для подпункта."""
+        # Выход за конец алфавита - редкий случай, обрабатываем исключением
+        try:
+            if index >= 0:
+                return cls.SUBCLAUSE_LETTERS[index]
+        except IndexError:
+            pass
+        return f"[{index + 1}]"
+    
+    @classmethod
+    def format_subclause(cls, text: str, index: int, is_last: bool = False,
+                         assume_stripped: bool = False) -> str:
+        """Форматирует подпункт: а) текст;"""
+        # НЕ убираем знаки препинания в конце текста - логика та же, что у списка 'alpha'
+        return cls.format_list_item(text, index, 'alpha', is_last, assume_stripped)
+    
+    # Префиксы элементов списка по стилю: (cls, index) -> префикс
+    _LIST_PREFIXES: Dict[str, Callable[[Any, int], str]] = {
+        'alpha': lambda cls, index: f"{cls.get_subclause_letter(index)})",    # а), б), в)
+        'numeric': lambda cls, index: f"{index + 1})",                        # 1), 2), 3)
+        'roman': lambda cls, index: f"{_roman_numeral(index)})",              # I), II), III)
+        'bullet': lambda cls, index: "–",                                     # – текст
+    }
+    
+    @classmethod
+    def format_list_item(cls, item_text: str, index: int, style: str, is_last: bool = False,
+                         assume_stripped: bool = False) -> str:
+        """Форматирует элемент списка в зависимости от стиля.
+        
+        assume_stripped=True - вызывающий код уже убрал пробелы по краям текста.
+        """
+        if not assume_stripped:
+            item_text = item_text.strip()
+        
+        if style == 'no_bullet':
+            # Без дефисов и без нумерации - просто текст
+            # Убираем лишние знаки препинания, если они уже есть
+            if item_text and item_text[-1] not in _TAIL_PUNCT:
+                return f"{item_text}."
+            return item_text
+        
+        # Неизвестный стиль оформляется как bullet
+        prefix_func = cls._LIST_PREFIXES.get(style) or cls._LIST_PREFIXES['bullet']
+        prefix = prefix_func(cls, index)
+        
+        # Если знак препинания уже есть - оставляем как есть
+        if item_text and item_text[-1] in _TAIL_PUNCT:
+            return f"{prefix} {item_text}"
+        
+        # Для последнего пункта - точка, для остальных - точка с запятой
+        delimiter = "." if is_last else ";"
+        return f"{prefix} {item_text}{delimiter}"
+    
+    @classmethod
+    @functools.lru_cache(maxsize=16)
+    def get_level_style(cls, level: int) -> str:
+        """Возвращает стиль для заданного уровня вложенности.
+        
+        Args:
+            level: Уровень вложенности (0 - раздел, 1 - подраздел, 2 - пункт, 3 - подпункт)
+        
+        Returns:
+            Имя стиля для использования в XML
+        """
+        if level == 0:
+            return "Heading_20_1"      # Раздел 1
+        elif level == 1:
+            return "Heading_20_2"      # 1.1 Подраздел
+        elif level == 2:
+            return "Clause"            # 1.1.1 Пункт
+        elif level == 3:
+            return "Subclause"         # а) Подпункт
+        else:
+            # Для более глубоких уровней используем Normal с отступами
+            return "Normal"
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get_styles_xml(cls) -> str:
+        """Возвращает XML для автоматических стилей (content.xml)."""
+        # Вычисляем значения на основе переменных
+        return _STYLES_XML_TEMPLATE.substitute(
+            FONT_FAMILY=cls.FONT_FAMILY,
+            FONT_SIZE=cls.FONT_SIZE,
+            LINE_HEIGHT=cls.LINE_HEIGHT,
+            PARAGRAPH_INDENT=cls.PARAGRAPH_INDENT,
+            PARAGRAPH_MARGIN_TOP=cls.PARAGRAPH_MARGIN_TOP,
+            PARAGRAPH_MARGIN_BOTTOM=cls.PARAGRAPH_MARGIN_BOTTOM,
+            TOC_TAB_POSITION=cls.get_toc_tab_position(),        # e.g., "19.5cm" (21см - 1.5см)
+            TOC_LEFT_INDENT=cls.get_toc_left_indent(),          # e.g., "4.2cm" (3см + 1.2см)
+            TOC_LEVEL_STYLES=cls.get_toc_level_styles_xml(),    # TOC2..TOC4 для вложенных уровней
+            TABLE_WIDTH=cls.get_table_width(),                  # e.g., "16.5cm"
+            TABLE_COLUMN_WIDTH=cls.get_table_column_width(3),   # e.g., "5.3cm" для 3 столбцов
+        )
 
 # ============================================================================
 # ОСНОВНЫЕ УТИЛИТЫ ГОСТ
 # ============================================================================
 
+# Заголовок content.xml документа ODT (неизменяемый)
+_XML_HEADER: Tuple[str, ...] = (
+    '<?xml version="1.0" encoding="UTF-8"?>',
+    '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"',
+    '  xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"',
+    '  xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"',
+    '  xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"',
+    '  xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"',
+    '  xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"',
+    '  xmlns:xlink="http://www.w3.org/1999/xlink"',
+    '  xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0"',
+    '  office:version="1.2">',
+)
+
+# Обрамление тела content.xml
+_XML_BODY_OPEN: Tuple[str, ...] = ('  <office:body>', '    <office:text>')
+_XML_BODY_CLOSE: Tuple[str, ...] = ('    </office:text>', '  </office:body>', '</office:document-content>')
+
+# Неизменяемые фрагменты тела документа. Литералы и так хранятся в константах
+# кода функции, поэтому выигрыш не в аллокациях, а в одном месте определения
+_XML_PAGE_BREAK = '      <text:p text:style-name="PageBreak"/>'
+_XML_TITLE_PAGE_COMMENT = '      <!-- ========== ТИТУЛЬНЫЙ ЛИСТ ========== -->'
+_XML_TOC_COMMENT = '      <!-- ========== СОДЕРЖАНИЕ ========== -->'
+_XML_APPENDIX_OPEN: Tuple[str, ...] = ('      <!-- ========== ПРИЛОЖЕНИЯ ========== -->', _XML_PAGE_BREAK)
+
+# Символы, требующие экранирования в XML
+_XML_SPECIAL_RE = re.compile(r'[&<>"\']')
+
+# Строки не длиннее этого экранируются через LRU-кэш (подписи, ячейки, заголовки)
+_ESCAPE_CACHE_MAX_LEN = 128
+
+
+def _escape_xml_text(text: str) -> str:
+    """Экранирует специальные XML символы в строке."""
+    # Большинство строк не содержит спецсимволов - возвращаем их без копирования
+    if not _XML_SPECIAL_RE.search(text):
+        return text
+    
+    # Цепочка replace работает через memchr и на кириллице быстрее, чем
+    # str.translate или re.sub с функцией замены; '&' - строго первым
+    return (text
+            .replace('&', '&amp;')
+            .replace('<', '&lt;')
+            .replace('>', '&gt;')
+            .replace('"', '&quot;')
+            .replace("'", '&apos;'))
+
+
+# Повторяющиеся короткие строки экранируются один раз
+_escape_xml_cached = functools.lru_cache(maxsize=4096)(_escape_xml_text)
+
+# Разобранные YAML файлы: (путь, mtime_ns) -> данные
+_YAML_CACHE: Dict[Tuple[str, int], Any] = {}
+
+# Маркер отсутствующего значения в кэшах (None - допустимое значение)
+_MISSING = object()
+
+# Сегмент пути с индексом списка: key[idx]
+_PATH_INDEX_RE = re.compile(r'([^\[]*)\[(\d+)\]')
+
+# Плейсхолдер вида {{ path.to.value }}
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*(.+?)\s*\}\}')
+
+# Последовательность пробельных символов
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Пробельные символы, которые _WHITESPACE_RE заменил бы: серии или не-пробел
+_WHITESPACE_COLLAPSE_RE = re.compile(r'\s{2,}|[^\S ]')
+
+
+# Разобранные YAML между запусками: json.loads в ~10 раз быстрее CSafeLoader.
+# Один JSON-файл в выходной папке проекта - только данные, без исполняемого
+# содержимого; записи сверяются с хэшем исходника
+_YAML_JSON_CACHE_PATH = Path(__file__).resolve().parents[2] / "output" / ".yaml-cache.json"
+
+# Содержимое _YAML_JSON_CACHE_PATH: путь -> [хэш исходника, данные] (None - еще не прочитан)
+_yaml_json_entries: Optional[Dict[str, Any]] = None
+
+# Значения, которые JSON передает без потерь (даты и т.п. не кэшируются)
+_JSON_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _is_json_data(value: Any) -> bool:
+    """True, если значение переживет JSON без потерь (ключи - только строки)."""
+    if type(value) is dict:
+        return all(type(key) is str and _is_json_data(item) for key, item in value.items())
+    if type(value) is list:
+        return all(map(_is_json_data, value))
+    return type(value) in _JSON_SCALAR_TYPES
+
+
+def _yaml_json_cache() -> Dict[str, Any]:
+    """Записи кэша; файл читается один раз за процесс."""
+    global _yaml_json_entries
+    if _yaml_json_entries is None:
+        try:
+            entries = json.loads(_YAML_JSON_CACHE_PATH.read_bytes())
+        except (OSError, ValueError):
+            # Нет файла или он поврежден - начинаем с пустого кэша
+            entries = None
+        _yaml_json_entries = entries if type(entries) is dict else {}
+    return _yaml_json_entries
+
+
+def _store_yaml_json_cache(key: str, digest: str, data: Any) -> None:
+    """Добавляет запись и перезаписывает файл кэша."""
+    entries = _yaml_json_cache()
+    entries[key] = [digest, data]
+    # Записи удаленных или перемещенных исходников не копятся
+    for stale in [path for path in entries if not os.path.exists(path)]:
+        del entries[stale]
+    try:
+        _YAML_JSON_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _YAML_JSON_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, _YAML_JSON_CACHE_PATH)
+    except OSError as e:
+        logger.debug("Не удалось сохранить кэш YAML %s: %s", _YAML_JSON_CACHE_PATH, e)
+
+
+def _load_yaml_cached(file_path: Path) -> Any:
+    """Разбирает YAML файл; повторный вызов без изменений файла - из кэша.
+    
+    Внутри процесса кэш - словарь по (путь, mtime_ns), между запусками -
+    docs/output/.yaml-cache.json. Результат общий для всех
+    вызывающих - изменять его нельзя.
+    """
+    stat = file_path.stat()
+    key = (str(file_path), stat.st_mtime_ns)
+    data = _YAML_CACHE.get(key, _MISSING)
+    if data is _MISSING:
+        raw = file_path.read_bytes()
+        digest = hashlib.blake2b(raw).hexdigest()
+        source = str(file_path.resolve())
+        entry = _yaml_json_cache().get(source)
+        if type(entry) is list and len(entry) == 2 and entry[0] == digest:
+            data = entry[1]
+        else:
+            data = yaml.load(raw, Loader=_YamlLoader)
+            if _is_json_data(data):
+                _store_yaml_json_cache(source, digest, data)
+        _YAML_CACHE[key] = data
+    return data
+
+
 class GOSTSharedUtils:
     """Общие утилиты для ГОСТ документов."""
     
@@ -544,12 +783,11 @@ class GOSTSharedUtils:
         if not isinstance(text, str):
             return str(text) if text is not None else ""
         
-        return (text
-                .replace('&', '&amp;')
-                .replace('<', '&lt;')
-                .replace('>', '&gt;')
-                .replace('"', '&quot;')
-                .replace("'", '&apos;'))
+        # Длинные тексты почти не повторяются - кэшируем только короткие,
+        # чтобы память кэша оставалась ограниченной
+        if len(text) <= _ESCAPE_CACHE_MAX_LEN:
+            return _escape_xml_cached(text)
+        return _escape_xml_text(text)
     
     @staticmethod
     def clean_text(text: str) -> str:
@@ -557,17 +795,9 @@ class GOSTSharedUtils:
         if not text:
             return ""
         
-        import re
-        # Заменяем множественные переводы строк на одинарные
-        text = re.sub(r'\n\s*\n+', '\n', text)
-        # Убираем пробелы в начале строк
-        text = re.sub(r'^\s+', '', text, flags=re.MULTILINE)
-        # Убираем пробелы в конце строк
-        text = re.sub(r'\s+$', '', text, flags=re.MULTILINE)
-        # Заменяем множественные пробелы на одинарные
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        # Любая последовательность пробельных символов (включая переводы строк
+        # и пробелы по краям строк) сворачивается в один пробел за один проход
+        return _WHITESPACE_RE.sub(' ', text).strip()
     
     @staticmethod
     def _deep_update(target: Dict, source: Dict):
@@ -578,33 +808,31 @@ class GOSTSharedUtils:
             else:
                 target[key] = value
     
+    @staticmethod
+    def load_yaml_file(file_path: Path) -> Any:
+        """Загружает один YAML файл (CSafeLoader, кэш по пути и mtime).
+        
+        Возвращается копия: шаблоны дополняются при обработке блоков.
+        """
+        return copy.deepcopy(_load_yaml_cached(Path(file_path)))
+    
     @staticmethod
     def load_yaml_data(file_paths: List[Path]) -> Dict:
         """Загружает данные из YAML файлов."""
         data: Dict[str, Any] = {}
         for file_path in file_paths:
             if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    file_data = yaml.safe_load(f)
-                    if file_data:
-                        GOSTSharedUtils._deep_update(data, file_data)
+                file_data = _load_yaml_cached(file_path)
+                if file_data:
+                    # Копия, чтобы слияние не изменяло закэшированные данные
+                    GOSTSharedUtils._deep_update(data, copy.deepcopy(file_data))
         return data
     
     @staticmethod
     def create_xml_header() -> List[str]:
         """Создает заголовок XML документа ODT."""
-        return [
-            '<?xml version="1.0" encoding="UTF-8"?>',
-            '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"',
-            '  xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"',
-            '  xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"',
-            '  xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"',
-            '  xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"',
-            '  xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"',
-            '  xmlns:xlink="http://www.w3.org/1999/xlink"',
-            '  xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0"'  # ← ДОБАВЬТЕ ЭТУ СТРОКУ!
-            '  office:version="1.2">'
-        ]
+        # Копия, так как вызывающий код дописывает в список тело документа
+        return list(_XML_HEADER)
 
 
 # ============================================================================
@@ -614,18 +842,34 @@ class GOSTSharedUtils:
 class GOSTDataProcessor:
     """Обработчик данных для ГОСТ документов."""
     
+    # Фиксированный набор атрибутов: без __dict__, доступ по слотам
+    __slots__ = ('data', '_path_cache')
+    
     def __init__(self, data: Dict[str, Any]):
         self.data = data
+        # Кэш разрешенных путей: path -> значение (data после создания не меняется)
+        self._path_cache: Dict[str, Any] = {}
     
     def get_nested_value(self, path: str) -> Any:
         """Получает значение по вложенному пути."""
+        cached = self._path_cache.get(path, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        value = self._resolve_path(path)
+        self._path_cache[path] = value
+        return value
+    
+    def _resolve_path(self, path: str) -> Any:
+        """Проходит по self.data согласно пути вида 'a.b[0].c'."""
         parts = path.split('.')
         current = self.data
         
         for part in parts:
-            if '[' in part and ']' in part:
-                key_part = part[:part.index('[')]
-                idx = int(part[part.index('[')+1:part.index(']')])
+            index_match = _PATH_INDEX_RE.match(part) if '[' in part else None
+            if index_match:
+                key_part = index_match.group(1)
+                idx = int(index_match.group(2))
                 
                 if key_part in current and isinstance(current[key_part], list) and idx < len(current[key_part]):
                     current = current[key_part][idx]
@@ -647,35 +891,138 @@ class GOSTDataProcessor:
         if not text:
             return ""
         
-        text = str(text).strip()  # Явное преобразование в str
-        
-        def replace(match):
-            placeholder = match.group(1).strip()
-            value = self.get_nested_value(placeholder)
-            
-            if value is None:
-                return ""
-            
-            return str(value)
+        if type(text) is not str:
+            text = str(text)  # Явное преобразование в str
+        text = text.strip()
         
-        # Заменяем все плейсхолдеры за один проход
-        result = re.sub(r'\{\{\s*(.+?)\s*\}\}', replace, text)
+        # Заменяем все плейсхолдеры за один проход; без '{{' заменять нечего
+        if '{{' in text:
+            result = _PLACEHOLDER_RE.sub(self._replace_placeholder_match, text)
+        else:
+            result = text
         
-        # Убираем возможные двойные пробелы
-        result = re.sub(r'\s+', ' ', result)
+        # Убираем возможные двойные пробелы (только если они действительно есть)
+        if _WHITESPACE_COLLAPSE_RE.search(result):
+            result = _WHITESPACE_RE.sub(' ', result)
         
         return result
+    
+    def _replace_placeholder_match(self, match: 're.Match') -> str:
+        """Возвращает значение для найденного плейсхолдера {{ path }}."""
+        placeholder = match.group(1).strip()
+        value = self.get_nested_value(placeholder)
+        
+        if value is None:
+            return ""
+        
+        return str(value)
 
 
 # ============================================================================
 # ГЕНЕРАТОР ОГЛАВЛЕНИЯ
 # ============================================================================
 
+# Служебные секции, которые не попадают в оглавление, нумерацию и обход структуры
+_SERVICE_IDS = frozenset(map(sys.intern, ("title_page", "table_of_contents", "appendices")))
+
+# Ключи дочерних узлов в порядке приоритета
+_CHILD_KEYS: Tuple[str, ...] = ('subsections', 'points', 'subpoints')
+
+# Тип узла по первому найденному ключу (узел без них - 'clause')
+_NODE_TYPE_BY_KEY: Tuple[Tuple[str, str], ...] = (
+    ('subsections', 'section'),
+    ('points', 'subsection'),
+    ('subpoints', 'point'),
+    ('blocks', 'subpoint'),
+)
+
+# Уровень узла по типу: 0=раздел, 1=подраздел, 2=пункт, 3=подпункт, 4=подподпункт
+_NODE_TYPE_LEVEL: Dict[str, int] = {
+    'section': 0,
+    'subsection': 1,
+    'point': 2,
+    'subpoint': 3,
+    'clause': 4,
+}
+
+
+
+def flatten_sections(sections: List[Dict]) -> Tuple[List[Dict], List[int], List[int], List[int]]:
+    """Разворачивает дерево секций в массивы в прямом порядке обхода.
+
+    Возвращает (узлы, индекс родителя или -1, уровень, индекс среди братьев).
+    Дочерние узлы берутся по первому найденному ключу из _CHILD_KEYS.
+    """
+    nodes: List[Dict] = []
+    parents: List[int] = []
+    levels: List[int] = []
+    positions: List[int] = []
+    
+    stack = [(enumerate(sections), -1, 0)]
+    while stack:
+        nodes_iter, parent_index, level = stack[-1]
+        for position, node in nodes_iter:
+            index = len(nodes)
+            nodes.append(node)
+            parents.append(parent_index)
+            levels.append(level)
+            positions.append(position)
+            
+            for key in _CHILD_KEYS:
+                if key in node:
+                    children = node[key]
+                    break
+            else:
+                children = None
+            if children:
+                stack.append((enumerate(children), index, level + 1))
+                break
+        else:
+            stack.pop()
+    
+    return nodes, parents, levels, positions
+
+
+# Поля записи узла и соответствующие им столбцы GOSTTOCGenerator
+_TOC_ENTRY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('id', '_bookmark_ids'),
+    ('section_id', '_section_ids'),
+    ('level', '_levels'),
+    ('title', '_titles'),
+    ('numbered', '_numbered'),
+    ('is_intro', '_is_intro'),
+    ('in_toc', '_in_toc'),
+)
+
+# Поля, которые заполнены только у узлов, попавших в оглавление
+_TOC_ONLY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('page', '_pages'),
+    ('display_number', '_display_numbers'),
+    ('escaped_title', '_escaped_titles'),
+    ('display_text', '_display_texts'),
+)
+
+
 class GOSTTOCGenerator:
-    """Генератор оглавления для ГОСТ документов с поддержкой уровней."""
+    """Генератор оглавления для ГОСТ документов с поддержкой уровней.
+
+    Записи всех узлов хранятся по столбцам (параллельные списки), узлы вне
+    оглавления отмечены флагом _in_toc. _id_to_index хранит индекс записи,
+    словари собираются только по запросу в toc_entries/id_to_entry/get_entry_by_id.
+    """
+    
+    # Строка оглавления целиком, включая переводы строк между тегами;
+    # вложенность задается стилем уровня (TOC, TOC2...), а не пробелами
+    _ENTRY_TMPL = (
+        '      <text:p text:style-name="{style_name}">\n'
+        '        <text:span>{display_text}</text:span>\n'
+        '        <text:tab/>\n'
+        '        <text:bookmark-ref text:reference-format="page" text:ref-name="{bookmark_id}">{page_num}</text:bookmark-ref>\n'
+        '      </text:p>'
+    )
     
     def __init__(self, doc_type: Optional[str] = None, max_levels: int = 2):
-        self.toc_entries: List[Dict] = []
+        self._reset_entries()
         self.toc_bookmark_counter = 0
         self.doc_type = doc_type
         self.max_levels = max_levels  # Количество уровней нумерации
@@ -683,26 +1030,81 @@ class GOSTTOCGenerator:
         self.section_counter = 0
         self.subsection_counter = 0
         self.point_counter = 0
-        # Маппинг id -> запись TOC
-        self.id_to_entry: Dict[str, Dict] = {}
-        self.node_numbers: Dict[str, List[int]] = {}
+        # Маппинг id узла -> индекс записи в столбцах
+        self._id_to_index: Dict[str, int] = {}
+        # Номера узлов кортежами (дочерний = родительский + (n,)); кортеж из 2-3
+        # малых чисел компактнее и списка, и array('H') с его заголовком
+        self.node_numbers: Dict[str, Tuple[int, ...]] = {}
+        # Готовые номера вида "1.2.3" для get_node_number
+        self.node_number_strings: Dict[str, str] = {}
     
-    def _get_node_children(self, node: Dict) -> List[Dict]:
-        """Получает дочерние элементы узла."""
-        if 'subsections' in node:
-            return node['subsections']
-        elif 'points' in node:
-            return node['points']
-        elif 'subpoints' in node:
-            return node['subpoints']
+    def _reset_entries(self) -> None:
+        """Очищает столбцы записей оглавления."""
+        # Для узлов вне TOC закладка "toc_<id>_<id>" выводится из id и не хранится (None)
+        self._bookmark_ids: List[Optional[str]] = []
+        self._section_ids: List[str] = []
+        self._levels: List[int] = []
+        self._titles: List[str] = []
+        self._pages: List[int] = []
+        self._numbered: List[bool] = []
+        self._display_numbers: List[str] = []
+        self._escaped_titles: List[str] = []
+        self._display_texts: List[str] = []
+        self._is_intro: List[bool] = []
+        self._in_toc: List[bool] = []
+        # Словари записей для toc_entries и id_to_entry; собираются при первом обращении
+        self._toc_entries: Optional[List[Dict]] = None
+        self._id_to_entry: Optional[Dict[str, Dict]] = None
+    
+    def _entry_view(self, index: int) -> Dict:
+        """Собирает словарь записи узла по индексу."""
+        entry = {key: getattr(self, column)[index] for key, column in _TOC_ENTRY_COLUMNS}
+        if entry['in_toc']:
+            for key, column in _TOC_ONLY_COLUMNS:
+                entry[key] = getattr(self, column)[index]
         else:
-            return []
+            node_id = entry['section_id']
+            entry['id'] = f"toc_{node_id}_{node_id}"
+        return entry
+    
+    @property
+    def toc_entries(self) -> List[Dict]:
+        """Записи оглавления в виде словарей.
 
+        Список собирается один раз и живет до следующего collect_toc_structure.
+        Только для чтения: вывод оглавления идет по столбцам, изменения
+        списка на него не влияют.
+        """
+        entries = self._toc_entries
+        if entries is None:
+            entries = self._toc_entries = [
+                self._entry_view(index) for index, in_toc in enumerate(self._in_toc) if in_toc]
+        return entries
+    
+    @property
+    def id_to_entry(self) -> Dict[str, Dict]:
+        """Записи всех узлов по id (словари записей оглавления - те же, что в toc_entries).
+
+        Собирается один раз до следующего collect_toc_structure, только для чтения.
+        Для одиночного поиска дешевле get_entry_by_id/get_bookmark_id.
+        """
+        mapping = self._id_to_entry
+        if mapping is None:
+            toc_views = dict(zip((index for index, in_toc in enumerate(self._in_toc) if in_toc),
+                                 self.toc_entries))
+            entry_view = self._entry_view
+            mapping = self._id_to_entry = {
+                node_id: toc_views.get(index) or entry_view(index)
+                for node_id, index in self._id_to_index.items()
+            }
+        return mapping
+    
     def collect_toc_structure(self, sections: List[Dict]) -> None:
         """Собирает структуру документа для оглавления."""
-        self.toc_entries = []
-        self.id_to_entry = {}
+        self._reset_entries()
+        self._id_to_index = {}
         self.node_numbers = {}
+        self.node_number_strings = {}
         self.toc_bookmark_counter = 0
         
         # Сбрасываем счетчики
@@ -711,165 +1113,203 @@ class GOSTTOCGenerator:
         self.point_counter = 0
         
         # Обрабатываем рекурсивно все уровни
-        self._collect_nodes_recursive(sections, [], 0)
+        self._collect_nodes(sections)
 
-    def _collect_nodes_recursive(self, nodes: List[Dict], parent_numbers: List[int], level: int) -> None:
-        """Рекурсивно собирает узлы всех уровней."""
-        for i, node in enumerate(nodes):
+    def _collect_nodes(self, sections: List[Dict]) -> None:
+        """Собирает узлы всех уровней по развернутому дереву (flatten_sections).
+
+        Узлы идут в прямом порядке, поэтому порядок закладок и нумерации
+        совпадает с рекурсивным обходом. Номер родителя и его строковый префикс
+        "1.2." берутся по индексу родителя; потомки пропущенного узла
+        (служебного или без id/name) пропускаются вместе с ним.
+        Атрибуты и методы append столбцов читаются в локальные переменные один раз,
+        счетчики записываются обратно в конце обхода.
+        """
+        bookmark_ids = self._bookmark_ids
+        bookmark_ids_append = bookmark_ids.append
+        section_ids_append = self._section_ids.append
+        levels_append = self._levels.append
+        titles_append = self._titles.append
+        numbered_append = self._numbered.append
+        is_intro_append = self._is_intro.append
+        in_toc_append = self._in_toc.append
+        pages_append = self._pages.append
+        display_numbers_append = self._display_numbers.append
+        escaped_titles_append = self._escaped_titles.append
+        display_texts_append = self._display_texts.append
+        section_counter = self.section_counter
+        bookmark_counter = self.toc_bookmark_counter
+        id_to_index = self._id_to_index
+        node_numbers = self.node_numbers
+        node_number_strings = self.node_number_strings
+        doc_type = self.doc_type
+        max_levels = self.max_levels
+        escape_xml = GOSTSharedUtils.escape_xml
+        intern = sys.intern
+        # Введение особо обрабатывается только в РЭ (не в TOC) и ТУ (в TOC)
+        intro_special = doc_type in ('re', 'tu')
+        intro_in_toc = doc_type != 're'
+
+        nodes, parents, node_levels, positions = flatten_sections(sections)
+        # Номер и префикс номера каждого обработанного узла (None - узел пропущен)
+        numbers_of: List[Optional[Tuple[int, ...]]] = [None] * len(nodes)
+        prefix_of: List[str] = [""] * len(nodes)
+        
+        for index, node in enumerate(nodes):
+            parent_index = parents[index]
+            if parent_index < 0:
+                parent_numbers = ()
+                parent_prefix = ""
+            else:
+                parent_numbers = numbers_of[parent_index]
+                if parent_numbers is None:
+                    # Родитель пропущен - пропускаем и все его поддерево
+                    continue
+                parent_prefix = prefix_of[parent_index]
+            level = node_levels[index]
+            i = positions[index]
+            
             node_id = node.get('id', '')
             node_name = node.get('name', '').strip()
             
             if not node_id or not node_name:
                 continue
             
+            # id используется ключом в нескольких словарях: интернируем,
+            # чтобы сравнения при поиске сводились к проверке идентичности
+            if type(node_id) is str:
+                node_id = intern(node_id)
+            
             # Пропускаем служебные секции
-            if node_id in ["title_page", "table_of_contents", "appendices"]:
+            if node_id in _SERVICE_IDS:
                 continue
             
-            # Определяем, как обрабатывать узел в зависимости от типа документа
-            should_number = True
-            should_be_in_toc = True
-            is_intro = False
-            
-            # Для РЭ: "intro" не нумеруется и не в TOC
-            if node_id == "intro" and self.doc_type == 're':
-                should_number = False
-                should_be_in_toc = False
-                is_intro = True
-            
-            # Для ТУ: "intro" не нумеруется, но в TOC
-            elif node_id == "intro" and self.doc_type == 'tu':
-                should_number = False
-                should_be_in_toc = True
-                is_intro = True
+            # Для РЭ "intro" не нумеруется и не в TOC, для ТУ не нумеруется, но в TOC
+            is_intro = intro_special and node_id == "intro"
+            should_number = not is_intro
+            should_be_in_toc = intro_in_toc or not is_intro
             
             # Рассчитываем номер для ВСЕХ узлов (даже если не попадут в TOC)
             if should_number:
                 if level == 0 and not is_intro:
                     # Раздел: 1, 2, 3...
-                    self.section_counter += 1
-                    current_numbers = [self.section_counter]
-                elif level == 1:
-                    # Подраздел: 1.1, 1.2, 2.1...
-                    current_subsection = i + 1
-                    if parent_numbers and len(parent_numbers) > 0:
-                        current_numbers = parent_numbers + [current_subsection]
-                    else:
-                        current_numbers = [1, current_subsection]
+                    section_counter += 1
+                    current_numbers = (section_counter,)
+                    display_number = str(section_counter)
+                elif level == 1 and not parent_numbers:
+                    # Подраздел без нумерованного родителя: 1.1, 1.2...
+                    current_numbers = (1, i + 1)
+                    display_number = f"1.{i + 1}"
                 else:
-                    # Более глубокие уровни: 1.1.1, 1.1.2, 1.2.1...
-                    current_numbers = parent_numbers + [i + 1]
+                    # Подразделы и более глубокие уровни: 1.1, 1.1.1, 1.2.1...
+                    current_numbers = parent_numbers + (i + 1,)
+                    display_number = f"{parent_prefix}{i + 1}"
                 
                 # ВСЕГДА сохраняем номера для всех узлов
-                self.node_numbers[node_id] = current_numbers
+                node_numbers[node_id] = current_numbers
+                node_number_strings[node_id] = display_number
+                child_prefix = display_number + "."
             else:
-                current_numbers = []
+                current_numbers = ()
+                display_number = ""
+                child_prefix = ""
             
-            # Добавляем в TOC только если должен быть и уровень меньше лимита
-            if should_be_in_toc and level < self.max_levels:
-                display_number = ".".join(str(num) for num in current_numbers) if current_numbers else ""
-                
-                self.toc_bookmark_counter += 1
-                entry_id = f"toc_{node_id}_{self.toc_bookmark_counter}"
+            # Одна запись на узел; в TOC только если должен быть и уровень меньше лимита
+            id_to_index[node_id] = len(bookmark_ids)
+            section_ids_append(node_id)
+            levels_append(level)
+            titles_append(node_name)
+            numbered_append(should_number)
+            is_intro_append(is_intro)
+            pages_append(1)
+            display_numbers_append(display_number)
+            
+            if should_be_in_toc and level < max_levels:
+                bookmark_counter += 1
                 
-                entry = {
-                    'id': entry_id,
-                    'section_id': node_id,
-                    'level': level,
-                    'title': node_name,
-                    'page': 1,
-                    'numbered': should_number,
-                    'display_number': display_number,
-                    'is_intro': is_intro,
-                    'in_toc': True
-                }
+                # Экранируем заголовок один раз при сборе
+                escaped_title = escape_xml(node_name)
+                if should_number and display_number:
+                    display_text = f"{display_number} {escaped_title}"
+                else:
+                    display_text = escaped_title
                 
-                self.toc_entries.append(entry)
-                self.id_to_entry[node_id] = entry
+                bookmark_ids_append(f"toc_{node_id}_{bookmark_counter}")
+                in_toc_append(True)
+                escaped_titles_append(escaped_title)
+                display_texts_append(display_text)
             else:
-                # Запись для узлов не в TOC (нужна для закладок и нумерации)
-                self.id_to_entry[node_id] = {
-                    'id': f"toc_{node_id}_{node_id}",
-                    'section_id': node_id,
-                    'level': level,
-                    'title': node_name,
-                    'numbered': should_number,
-                    'is_intro': is_intro,
-                    'in_toc': False
-                }
+                # Узел не в TOC (запись нужна для закладок и нумерации);
+                # id закладки соберет _entry_view, если он понадобится
+                bookmark_ids_append(None)
+                in_toc_append(False)
+                escaped_titles_append("")
+                display_texts_append("")
             
-            # Рекурсивно обрабатываем дочерние элементы (ВСЕ уровни)
-            children = self._get_node_children(node)
-            if children:
-                self._collect_nodes_recursive(children, current_numbers, level + 1)
-
-    def _determine_node_type(self, node: Dict, level: int) -> str:
-        """Определяет тип узла по его структуре."""
-        if 'subsections' in node:
-            return 'section'
-        elif 'points' in node:
-            return 'subsection'
-        elif 'subpoints' in node:
-            return 'point'
-        elif 'blocks' in node:
-            if level >= 2:
-                return 'point'
-            else:
-                return 'clause'
-        elif 'content' in node:
-            return 'content'
-        else:
-            return 'clause'
+            # Поддерево узла получит его номер через индекс родителя
+            numbers_of[index] = current_numbers
+            prefix_of[index] = child_prefix
+        
+        self.section_counter = section_counter
+        self.toc_bookmark_counter = bookmark_counter
 
-  
     def get_entry_by_id(self, node_id: str) -> Optional[Dict]:
         """Получает запись TOC по id узла."""
-        return self.id_to_entry.get(node_id)
+        index = self._id_to_index.get(node_id)
+        if index is None:
+            return None
+        return self._entry_view(index)
+    
+    def get_bookmark_id(self, node_id: str) -> Optional[str]:
+        """Id закладки узла (как entry['id'] из get_entry_by_id) без сборки словаря."""
+        index = self._id_to_index.get(node_id)
+        if index is None:
+            return None
+        bookmark_id = self._bookmark_ids[index]
+        if bookmark_id is None:
+            # Узлы вне оглавления получают закладку по своему id
+            node_id = self._section_ids[index]
+            return f"toc_{node_id}_{node_id}"
+        return bookmark_id
     
     def get_node_number(self, node_id: str) -> str:
         """Получает номер узла в формате X.Y.Z.W..."""
-        if node_id in self.node_numbers:
-            numbers = self.node_numbers[node_id]
-            # Для intro возвращаем пустую строку
-            if node_id == "intro" and self.doc_type == 're':
-                return ""
-            return ".".join(str(num) for num in numbers)
-        return ""
+        # Частый случай - одна проверка по готовой таблице; intro в РЭ
+        # не нумеруется при сборе, поэтому в таблицу не попадает
+        number = self.node_number_strings.get(node_id)
+        if number is not None:
+            return number
+        
+        # Для intro возвращаем пустую строку
+        if node_id == "intro" and self.doc_type == 're':
+            return ""
+        # Номер без готовой строки (node_numbers заполнен снаружи)
+        numbers = self.node_numbers.get(node_id)
+        return _dotted(numbers) if numbers else ""
     
     def generate_toc_xml(self, title: str = "Содержание") -> List[str]:
         """Генерация XML для оглавления."""
-        xml_parts = []
-        
         # Заголовок оглавления
-        xml_parts.append(f'      <text:p text:style-name="TOCTitle">{title}</text:p>')
-        
-        if not self.toc_entries:
-            xml_parts.append('      <text:p text:style-name="TOC">[Оглавление будет сгенерировано]</text:p>')
-            return xml_parts
-        
-        for entry in self.toc_entries:
-            level = entry['level']
-            title_text = GOSTSharedUtils.escape_xml(entry['title'])
-            bookmark_id = entry['id']
-            page_num = entry.get('page', 1)
-            numbered = entry.get('numbered', True)
-            
-            # Формируем отображаемый текст
-            if numbered and 'display_number' in entry:
-                display_number = entry['display_number']
-                display_text = f"{display_number} {title_text}"
-            else:
-                display_text = title_text
-            
-            # Отступ для вложенных уровней
-            indent = "    " * level
-            
-            xml_parts.append(f'      <text:p text:style-name="TOC">')
-            xml_parts.append(f'        <text:span>{indent}{display_text}</text:span>')
-            xml_parts.append(f'        <text:tab/>')
-            xml_parts.append(f'        <text:bookmark-ref text:reference-format="page" text:ref-name="{bookmark_id}">{page_num}</text:bookmark-ref>')
-            xml_parts.append(f'      </text:p>')
-        
+        header = f'      <text:p text:style-name="TOCTitle">{title}</text:p>'
+        
+        if True not in self._in_toc:
+            return [header, '      <text:p text:style-name="TOC">[Оглавление будет сгенерировано]</text:p>']
+        
+        # Стиль с отступом для вложенных уровней: глубже последнего - последний
+        entry_format = self._ENTRY_TMPL.format
+        last_style = len(_TOC_STYLES) - 1
+        xml_parts = [header]
+        xml_parts += [
+            entry_format(
+                style_name=_TOC_STYLES[level if level < last_style else last_style],
+                display_text=display_text,
+                bookmark_id=bookmark_id,
+                page_num=page_num,
+            )
+            for level, display_text, bookmark_id, page_num, in_toc in zip(
+                self._levels, self._display_texts, self._bookmark_ids, self._pages, self._in_toc)
+            if in_toc
+        ]
         return xml_parts
 
 
@@ -877,6 +1317,86 @@ class GOSTTOCGenerator:
 # ПРОЦЕССОР СЕКЦИЙ С ПОДДЕРЖКОЙ УРОВНЕЙ И BLOCKS
 # ============================================================================
 
+# Шаблоны XML остаются f-строками: str.format_map по шаблону-константе
+# в ~7 раз медленнее (f-строка собирается одной инструкцией BUILD_STRING)
+def _heading_paragraph(style_name: str, escaped_title: str,
+                       bookmark_id: Optional[str] = None) -> str:
+    """Абзац заголовка; с закладкой оглавления, если bookmark_id задан."""
+    if not bookmark_id:
+        return f'      <text:p text:style-name="{style_name}">{escaped_title}</text:p>'
+    return (
+        f'      <text:p text:style-name="{style_name}">\n'
+        f'        <text:bookmark-start text:name="{bookmark_id}"/>\n'
+        f'        {escaped_title}\n'
+        f'        <text:bookmark-end text:name="{bookmark_id}"/>\n'
+        f'      </text:p>'
+    )
+
+
+# (стиль текста, стиль списка) в blocks по уровню узла: 0-1, 2, 3 и глубже
+_BLOCK_STYLES: Tuple[Tuple[str, str], ...] = (
+    ("Clause", "Normal"),
+    ("Clause", "Normal"),
+    ("Clause", "Subclause"),
+    ("Normal", "Subclause"),
+)
+
+
+def _block_styles(parent_level: int) -> Tuple[str, str]:
+    """Стили абзацев текста и списков для blocks узла уровня parent_level."""
+    if parent_level < 0:
+        return _BLOCK_STYLES[0]
+    return _BLOCK_STYLES[min(parent_level, 3)]
+
+
+# Размер из шаблона: число и необязательная единица ("12cm", "80 mm")
+_SIZE_RE = re.compile(r'([\d.]+)(\D*)')
+_IMAGE_EXTENSIONS = frozenset(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif'))
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+
+def _read_image_dims(path: str) -> Optional[Tuple[int, int]]:
+    """Читает размеры PNG/JPEG/GIF/BMP из заголовка файла без PIL.
+    
+    Возвращает None для прочих форматов и повреждённых файлов.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(32)
+        if header.startswith(b'\x89PNG\r\n\x1a\n') and header[12:16] == b'IHDR':
+            return struct.unpack('>II', header[16:24])
+        if header[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', header[6:10])
+        if header[:2] == b'BM' and len(header) >= 26:
+            width, height = struct.unpack('<ii', header[18:26])
+            return width, abs(height)
+        if header[:2] == b'\xff\xd8':
+            # Идём по сегментам до маркера SOF
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code == 0xFF:
+                    f.seek(-1, 1)
+                    continue
+                if code == 0xD8 or 0xD0 <= code <= 0xD7:
+                    continue
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = struct.unpack('>H', length_bytes)[0]
+                if code in _JPEG_SOF_MARKERS:
+                    data = f.read(5)
+                    if len(data) < 5:
+                        return None
+                    height, width = struct.unpack('>HH', data[1:5])
+                    return width, height
+                f.seek(length - 2, 1)
+    return None
+
+
 class GOSTSectionProcessor:
     """Процессор секций с поддержкой вложенности и модели blocks."""
     
@@ -924,55 +1444,67 @@ class GOSTSectionProcessor:
         # Получаем запись TOC для закладки (если нужно)
         toc_bookmark_id = None
         if toc_generator:
-            entry = toc_generator.get_entry_by_id(node_id)
-            if entry:
-                toc_bookmark_id = entry.get('id')
+            toc_bookmark_id = toc_generator.get_bookmark_id(node_id)
         
         # Добавляем заголовок только если не пустой
         if node_name:
             style_name = GOSTFormatter.get_level_style(0)
             
-            if toc_bookmark_id:
-                xml_parts.append(f'      <text:p text:style-name="{style_name}">')
-                xml_parts.append(f'        <text:bookmark-start text:name="{toc_bookmark_id}"/>')
-                xml_parts.append(f'        {GOSTSharedUtils.escape_xml(node_name)}')
-                xml_parts.append(f'        <text:bookmark-end text:name="{toc_bookmark_id}"/>')
-                xml_parts.append(f'      </text:p>')
-            else:
-                xml_parts.append(f'      <text:p text:style-name="{style_name}">{GOSTSharedUtils.escape_xml(node_name)}</text:p>')
+            xml_parts.append(_heading_paragraph(style_name, GOSTSharedUtils.escape_xml(node_name), toc_bookmark_id))
         
         # Обрабатываем blocks
-        if 'blocks' in section:
-            self._process_blocks(section['blocks'], xml_parts, 0)
+        blocks = section.get('blocks')
+        if blocks is not None:
+            self._process_blocks(blocks, xml_parts, 0, _BLOCK_STYLES[0])
         
         # Разрыв страницы после введения
-        xml_parts.append('      <text:p text:style-name="PageBreak"/>')
+        xml_parts.append(_XML_PAGE_BREAK)
     
     def _process_node_recursive(self, node: Dict, xml_parts: List[str], parent_id: Optional[str], 
                             toc_generator: Optional['GOSTTOCGenerator'], parent_level: int = -1):
-        """Рекурсивная обработка узла документа любого уровня вложенности."""
+        """Обработка узла документа и всех его потомков любого уровня вложенности.
+
+        Обход идет по явному стеку (узел, id родителя, уровень родителя) без рекурсии:
+        потомки кладутся в стек в обратном порядке, поэтому XML выводится в прямом
+        порядке, как при рекурсивном обходе.
+        """
+        stack = [(node, parent_id, parent_level)]
+        while stack:
+            node, parent_id, parent_level = stack.pop()
+            processed = self._process_node(node, xml_parts, toc_generator, parent_level)
+            if processed is None:
+                continue
+            node_id, level, children = processed
+            if children:
+                stack.extend((child, node_id, level) for child in reversed(children))
+    
+    def _process_node(self, node: Dict, xml_parts: List[str],
+                      toc_generator: Optional['GOSTTOCGenerator'],
+                      parent_level: int) -> Optional[Tuple[str, int, List[Dict]]]:
+        """Выводит заголовок и blocks одного узла.
+
+        Returns:
+            (id узла, уровень, дочерние узлы) или None для служебных секций
+        """
         node_id = node.get('id', '')
         node_name = node.get('name', '').strip()
         
         # Пропускаем служебные секции
-        if node_id in ["title_page", "table_of_contents", "appendices"]:
-            return
+        if node_id in _SERVICE_IDS:
+            return None
+        
+        blocks = node.get('blocks')
         
         # Обработка плейсхолдеров в имени узла
         if node_name:
-            
-            # Проверяем есть ли плейсхолдеры
-            import re
-            placeholders = re.findall(r'\{\{\s*(.+?)\s*\}\}', node_name)
-            
             # Заменяем плейсхолдеры
             node_name = self.data_processor.replace_placeholders(node_name)
             
             if '{{image_counter_next}}' in node_name:
                 # Нужно найти первое изображение в блоках этого узла
                 first_image_num = None
-                if 'blocks' in node:
-                    for block in node.get('blocks', []):
+                if blocks:
+                    for block in blocks:
                         if isinstance(block, dict) and 'image' in block:
                             first_image_num = self.image_counter + 1
                             break
@@ -986,14 +1518,7 @@ class GOSTSectionProcessor:
         # Уровень зависит от типа узла и уровня родителя
         if parent_level == -1:
             # Корневой уровень
-            level_map = {
-                'section': 0,
-                'subsection': 1,
-                'point': 2,
-                'subpoint': 3,
-                'clause': 4
-            }
-            level = level_map.get(node_type, 4)
+            level = _NODE_TYPE_LEVEL.get(node_type, 4)
         else:
             # Дочерний уровень: уровень = родительский уровень + 1
             # Но для некоторых типов может быть другой маппинг
@@ -1030,35 +1555,26 @@ class GOSTSectionProcessor:
             # Ищем закладку в оглавлении
             toc_bookmark_id = None
             if toc_generator:
-                entry = toc_generator.get_entry_by_id(node_id)
-                if entry:
-                    toc_bookmark_id = entry.get('id')
+                toc_bookmark_id = toc_generator.get_bookmark_id(node_id)
             
-            if toc_bookmark_id:
-                xml_parts.append(f'      <text:p text:style-name="{style_name}">')
-                xml_parts.append(f'        <text:bookmark-start text:name="{toc_bookmark_id}"/>')
-                xml_parts.append(f'        {GOSTSharedUtils.escape_xml(full_title)}')
-                xml_parts.append(f'        <text:bookmark-end text:name="{toc_bookmark_id}"/>')
-                xml_parts.append(f'      </text:p>')
-            else:
-                xml_parts.append(f'      <text:p text:style-name="{style_name}">{GOSTSharedUtils.escape_xml(full_title)}</text:p>')
+            xml_parts.append(_heading_paragraph(style_name, GOSTSharedUtils.escape_xml(full_title), toc_bookmark_id))
         
         # Обрабатываем blocks
-        if 'blocks' in node:
-            self._process_blocks(node['blocks'], xml_parts, level)
+        if blocks is not None:
+            self._process_blocks(blocks, xml_parts, level, _block_styles(level))
         
-        # Рекурсивно обрабатываем дочерние элементы
-        children = []
+        # Дочерние элементы обрабатывает вызывающий обход. Проверяется наличие
+        # ключа, а не значение: "subsections:" без значения тоже перекрывает points
         if 'subsections' in node:
             children = node['subsections']
         elif 'points' in node:
             children = node['points']
         elif 'subpoints' in node:
             children = node['subpoints']
+        else:
+            children = None
         
-        if children:
-            for child in children:
-                self._process_node_recursive(child, xml_parts, node_id, toc_generator, level)
+        return node_id, level, children
     
     def _determine_node_type(self, node: Dict) -> str:
         """
@@ -1066,20 +1582,11 @@ class GOSTSectionProcessor:
         Новая схема не использует поле 'type', поэтому определяем по содержимому.
         """
         # Определяем по наличию определенных ключей
-        if 'subsections' in node:
-            return 'section'
-        elif 'points' in node:
-            return 'subsection'
-        elif 'subpoints' in node:
-            return 'point'
-        elif 'blocks' in node:
-            # Для узлов с blocks проверяем контекст
-            # Если выше был points, то это subpoint
-            # Если выше был subpoints, то это более глубокий уровень
-            return 'subpoint'
-        else:
-            # Узел без явных дочерних элементов
-            return 'clause'
+        for key, node_type in _NODE_TYPE_BY_KEY:
+            if key in node:
+                return node_type
+        # Узел без явных дочерних элементов
+        return 'clause'
     
     def _determine_node_level(self, node: Dict) -> int:
         """
@@ -1094,20 +1601,14 @@ class GOSTSectionProcessor:
         # Определяем тип узла
         node_type = self._determine_node_type(node)
         
-        # Маппинг типа на уровень с учетом вложенности
-        # Уровни: 0=раздел, 1=подраздел, 2=пункт, 3=подпункт, 4=подподпункт
-        level_map = {
-            'section': 0,
-            'subsection': 1,
-            'point': 2,
-            'subpoint': 3,
-            'clause': 4
-        }
-        
-        return level_map.get(node_type, 4)
+        return _NODE_TYPE_LEVEL.get(node_type, 4)
     
-    def _process_blocks(self, blocks: List[Dict], xml_parts: List[str], parent_level: int):
-        """Обрабатывает блоки контента по новой схеме (без type)."""
+    def _process_blocks(self, blocks: List[Dict], xml_parts: List[str], parent_level: int,
+                        styles: Optional[Tuple[str, str]] = None):
+        """Обрабатывает блоки контента по новой схеме (без type).
+        
+        styles - (стиль текста, стиль списка), если вызывающий уже знает уровень.
+        """
         # Шаг 1: Сначала находим ВСЕ изображения в этих блоках и присваиваем им номера
         image_blocks = []
         for i, block in enumerate(blocks):
@@ -1119,50 +1620,56 @@ class GOSTSectionProcessor:
         for idx, (pos, block) in enumerate(image_blocks):
             image_positions[pos] = idx + 1 + self.image_counter  # +1 потому что нумерация с 1
         
+        # Номер первого изображения на позиции >= i (None - дальше изображений нет);
+        # один обратный проход вместо сортировки позиций на каждый плейсхолдер
+        next_image_at: List[Optional[int]] = [None] * (len(blocks) + 1)
+        for pos in range(len(blocks) - 1, -1, -1):
+            next_image_at[pos] = image_positions.get(pos, next_image_at[pos + 1])
+        
+        # Стили абзацев зависят только от уровня родителя
+        text_style, list_style = styles or _block_styles(parent_level)
+        
+        # Локальные ссылки вместо поиска атрибутов на каждый блок и элемент списка
+        escape_xml = GOSTSharedUtils.escape_xml
+        replace_placeholders = self.data_processor.replace_placeholders
+        
         # Шаг 2: Теперь обрабатываем все блоки, зная номера изображений
         for i, block in enumerate(blocks):
             if not isinstance(block, dict):
                 # Если это строка, обрабатываем как текст
                 if isinstance(block, str):
-                    processed_text = self.data_processor.replace_placeholders(block)
+                    processed_text = replace_placeholders(block)
                     if processed_text.strip():
-                        style_name = "Normal" if parent_level >= 3 else "Clause"
-                        xml_parts.append(f'      <text:p text:style-name="{style_name}">{GOSTSharedUtils.escape_xml(processed_text)}</text:p>')
+                        xml_parts.append(f'      <text:p text:style-name="{text_style}">{escape_xml(processed_text)}</text:p>')
                 continue
                 
-            # 1. Текстовый блок
-            if 'text' in block:
-                text_content = block['text']
+            # 1. Текстовый блок (одно обращение к словарю на ветку)
+            if (text_content := block.get('text')) is not None:
                 
-                # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ ТАБЛИЦ
-                if '{{table_counter_next}}' in text_content:
-                    next_table_num = self.table_counter + 1
-                    text_content = text_content.replace('{{table_counter_next}}', str(next_table_num))
+                # Плейсхолдеры счетчиков возможны только при наличии '{{'
+                if '{{' in text_content:
+                    # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ ТАБЛИЦ
+                    if '{{table_counter_next}}' in text_content:
+                        next_table_num = self.table_counter + 1
+                        text_content = text_content.replace('{{table_counter_next}}', str(next_table_num))
                 
-                # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ РИСУНКОВ
-                import re
-                if '{{image_counter_next}}' in text_content:
-                    # Ищем следующее изображение после этого текста
-                    next_image_num = None
-                    for pos in sorted(image_positions.keys()):
-                        if pos > i:  # Изображение, которое идет ПОСЛЕ этого текста
-                            next_image_num = image_positions[pos]
-                            break
+                    # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ РИСУНКОВ
+                    if '{{image_counter_next}}' in text_content:
+                        # Ищем следующее изображение после этого текста
+                        next_image_num = next_image_at[i + 1]
                     
-                    if next_image_num is None:
-                        # Если нет следующего изображения в этих блоках, используем следующий глобальный номер
-                        next_image_num = self.image_counter + 1
+                        if next_image_num is None:
+                            # Если нет следующего изображения в этих блоках, используем следующий глобальный номер
+                            next_image_num = self.image_counter + 1
                     
-                    text_content = re.sub(r'\{\{image_counter_next\}\}', str(next_image_num), text_content)
+                        text_content = text_content.replace('{{image_counter_next}}', str(next_image_num))
                 
-                processed_text = self.data_processor.replace_placeholders(text_content)
+                processed_text = replace_placeholders(text_content)
                 if processed_text.strip():
-                    style_name = "Normal" if parent_level >= 3 else "Clause"
-                    xml_parts.append(f'      <text:p text:style-name="{style_name}">{GOSTSharedUtils.escape_xml(processed_text)}</text:p>')
+                    xml_parts.append(f'      <text:p text:style-name="{text_style}">{escape_xml(processed_text)}</text:p>')
             
             # 2. Список
-            elif 'list' in block:
-                list_data = block['list']
+            elif (list_data := block.get('list')) is not None:
                 style = list_data.get('style', 'bullet')
                 items = list_data.get('items', [])
                 
@@ -1173,36 +1680,31 @@ class GOSTSectionProcessor:
                         else:
                             item_text = str(item)
                         
-                        # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ РИСУНКОВ В ЭЛЕМЕНТАХ СПИСКА
-                        import re
-                        if '{{image_counter_next}}' in item_text:
-                            # Для элементов списка ищем следующее изображение
-                            next_image_num = None
-                            for pos in sorted(image_positions.keys()):
-                                if pos > i:  # Изображение, которое идет ПОСЛЕ всего списка
-                                    next_image_num = image_positions[pos]
-                                    break
+                        # Плейсхолдеры счетчиков возможны только при наличии '{{'
+                        if '{{' in item_text:
+                            # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ РИСУНКОВ В ЭЛЕМЕНТАХ СПИСКА
+                            if '{{image_counter_next}}' in item_text:
+                                # Для элементов списка ищем следующее изображение после всего списка
+                                next_image_num = next_image_at[i + 1]
                             
-                            if next_image_num is None:
-                                next_image_num = self.image_counter + 1
+                                if next_image_num is None:
+                                    next_image_num = self.image_counter + 1
                             
-                            item_text = re.sub(r'\{\{image_counter_next\}\}', str(next_image_num), item_text)
+                                item_text = item_text.replace('{{image_counter_next}}', str(next_image_num))
                         
-                        # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ ТАБЛИЦ В ЭЛЕМЕНТАХ СПИСКА
-                        if '{{table_counter_next}}' in item_text:
-                            next_table_num = self.table_counter + 1
-                            item_text = item_text.replace('{{table_counter_next}}', str(next_table_num))
+                            # ЗАМЕНА ПЛЕСХОЛДЕРА ДЛЯ ТАБЛИЦ В ЭЛЕМЕНТАХ СПИСКА
+                            if '{{table_counter_next}}' in item_text:
+                                next_table_num = self.table_counter + 1
+                                item_text = item_text.replace('{{table_counter_next}}', str(next_table_num))
                         
-                        processed_item = self.data_processor.replace_placeholders(item_text)
+                        processed_item = replace_placeholders(item_text)
                         if processed_item.strip():
                             is_last = (item_idx == len(items) - 1)
                             formatted_item = GOSTFormatter.format_list_item(processed_item, item_idx, style, is_last)
-                            list_style = "Subclause" if parent_level >= 2 else "Normal"
-                            xml_parts.append(f'      <text:p text:style-name="{list_style}">{GOSTSharedUtils.escape_xml(formatted_item)}</text:p>')
+                            xml_parts.append(f'      <text:p text:style-name="{list_style}">{escape_xml(formatted_item)}</text:p>')
             
             # 3. Таблица
-            elif 'table' in block:
-                table_data = block['table']
+            elif (table_data := block.get('table')) is not None:
                 table_data['type'] = 'table'
                 self._process_table(table_data, xml_parts, '      ')
             
@@ -1214,11 +1716,26 @@ class GOSTSectionProcessor:
             
             # 5. Разрыв страницы
             elif 'page_break' in block:
-                xml_parts.append('      <text:p text:style-name="PageBreak"/>')
+                xml_parts.append(_XML_PAGE_BREAK)
         
+    @staticmethod
+    def _list_item_text(list_item: Any) -> Optional[str]:
+        """Текст элемента списка в старой модели content (None - пропустить)."""
+        if list_item is None:
+            return None
+        if isinstance(list_item, dict):
+            text = list_item.get('text')
+            return None if text is None else str(text)
+        return str(list_item)
+    
     def _process_content_item(self, item: Dict, xml_parts: List[str], indent: str, 
-                             level: int = 2, is_intro: bool = False):
-        """Обработка элемента контента (для обратной совместимости)."""
+                             level: int = 2, is_intro: bool = False,
+                             force_text_style: Optional[str] = None):
+        """Обработка элемента контента (для обратной совместимости).
+        
+        force_text_style задает стиль текстовых абзацев вместо выбора по уровню
+        (для содержимого пунктов - "Clause").
+        """
         item_type = item.get('type', '')
         
         if item_type in ['text', 'paragraph']:
@@ -1226,18 +1743,15 @@ class GOSTSectionProcessor:
             if text:
                 processed = self.data_processor.replace_placeholders(str(text))
                 if processed.strip():
-                    style = "Normal" if is_intro or level >= 3 else "Clause"
+                    style = force_text_style or ("Normal" if is_intro or level >= 3 else "Clause")
                     xml_parts.append(f'{indent}<text:p text:style-name="{style}">{GOSTSharedUtils.escape_xml(processed)}</text:p>')
         
         elif item_type == 'list':
-            items = item.get('items', [])
-            for list_item in items:
-                if list_item is None:
-                    continue
-                text = list_item.get('text') if isinstance(list_item, dict) else str(list_item)
+            for list_item in item.get('items', []):
+                text = self._list_item_text(list_item)
                 if text is None:
                     continue
-                processed = self.data_processor.replace_placeholders(str(text))
+                processed = self.data_processor.replace_placeholders(text)
                 if processed.strip():
                     formatted_item = f"– {processed.strip()}"
                     xml_parts.append(f'{indent}<text:p text:style-name="Normal">{GOSTSharedUtils.escape_xml(formatted_item)}</text:p>')
@@ -1251,35 +1765,12 @@ class GOSTSectionProcessor:
         elif item_type == 'page_break':
             xml_parts.append(f'{indent}<text:p text:style-name="PageBreak"/>')
     
-    def _process_point_content_item(self, item: Dict, xml_parts: List[str], indent: str):
-        """Обработка элемента контента пункта (для обратной совместимости)."""
-        item_type = item.get('type', '')
-        
-        if item_type in ['text', 'paragraph']:
-            text = item.get('value', '') or item.get('text', '')
-            if text:
-                processed = self.data_processor.replace_placeholders(str(text))
-                if processed.strip():
-                    xml_parts.append(f'{indent}<text:p text:style-name="Clause">{GOSTSharedUtils.escape_xml(processed)}</text:p>')
-        
-        elif item_type == 'list':
-            items = item.get('items', [])
-            for list_item in items:
-                if list_item is None:
-                    continue
-                text = list_item.get('text') if isinstance(list_item, dict) else str(list_item)
-                if text is None:
-                    continue
-                processed = self.data_processor.replace_placeholders(str(text))
-                if processed.strip():
-                    formatted_item = f"– {processed.strip()}"
-                    xml_parts.append(f'{indent}<text:p text:style-name="Normal">{GOSTSharedUtils.escape_xml(formatted_item)}</text:p>')
-        
-        elif item_type == 'table':
-            self._process_table(item, xml_parts, indent)
-        
-        elif item_type == 'image':
-            self._process_image(item, xml_parts, indent)
+    def _cell_text(self, cell: Any) -> str:
+        """Текст ячейки таблицы; пустая ячейка - один пробел."""
+        if cell is None:
+            return " "
+        # str() обязателен: без него replace_placeholders вернет "" для 0 и False
+        return self.data_processor.replace_placeholders(str(cell)).strip() or " "
     
     def _process_table(self, item: Dict, xml_parts: List[str], indent: str):
         """Обработка таблицы."""
@@ -1287,7 +1778,7 @@ class GOSTSectionProcessor:
         table_name = item.get('name', 'Таблица')
         
         if table_name:
-            processed_name = self.data_processor.replace_placeholders(str(table_name))
+            processed_name = self.data_processor.replace_placeholders(table_name)
             table_title = f"Таблица {self.table_counter} – {processed_name}"
             xml_parts.append(f'{indent}<text:p text:style-name="TableTitle">{GOSTSharedUtils.escape_xml(table_title)}</text:p>')
         
@@ -1308,44 +1799,99 @@ class GOSTSectionProcessor:
         for _ in range(col_count):
             xml_parts.append(f'{indent}  <table:table-column table:style-name="TableColumn"/>')
         
-        if headers:
-            xml_parts.append(f'{indent}  <table:table-row table:style-name="TableRow">')
-            for header in headers:
-                if header is None:
-                    continue
-                header_text = self.data_processor.replace_placeholders(str(header))
-                xml_parts.append(f'{indent}    <table:table-cell table:style-name="TableCellStyle" office:value-type="string">')
-                xml_parts.append(f'{indent}      <text:p text:style-name="TableHeader">{GOSTSharedUtils.escape_xml(header_text)}</text:p>')
-                xml_parts.append(f'{indent}    </table:table-cell>')
-            xml_parts.append(f'{indent}  </table:table-row>')
+        # Строка таблицы целиком - один элемент xml_parts
+        escape_xml = GOSTSharedUtils.escape_xml
+        row_open = f'{indent}  <table:table-row table:style-name="TableRow">\n'
+        row_close = f'\n{indent}  </table:table-row>'
+        cell_open = f'{indent}    <table:table-cell table:style-name="TableCellStyle" office:value-type="string">\n'
+        cell_close = f'</text:p>\n{indent}    </table:table-cell>'
         
+        if headers:
+            replace_placeholders = self.data_processor.replace_placeholders
+            header_cells = '\n'.join([
+                f'{cell_open}{indent}      <text:p text:style-name="TableHeader">'
+                f'{escape_xml(replace_placeholders(str(header)))}{cell_close}'
+                for header in headers if header is not None
+            ])
+            xml_parts.append(f'{row_open}{header_cells}{row_close}' if header_cells
+                             else f'{row_open[:-1]}{row_close}')
+        
+        cell_text = self._cell_text
         for row in rows:
             cells = row.get('cells', [])
             if len(cells) != col_count:
                 continue
             
-            xml_parts.append(f'{indent}  <table:table-row table:style-name="TableRow">')
-            for cell in cells:
-                if cell is None:
-                    cell_text = " "
-                else:
-                    cell_text = self.data_processor.replace_placeholders(str(cell)).strip()
-                if not cell_text:
-                    cell_text = " "
-                xml_parts.append(f'{indent}    <table:table-cell table:style-name="TableCellStyle" office:value-type="string">')
-                xml_parts.append(f'{indent}      <text:p text:style-name="TableCell">{GOSTSharedUtils.escape_xml(cell_text)}</text:p>')
-                xml_parts.append(f'{indent}    </table:table-cell>')
-            xml_parts.append(f'{indent}  </table:table-row>')
+            row_cells = '\n'.join([
+                f'{cell_open}{indent}      <text:p text:style-name="TableCell">'
+                f'{escape_xml(cell_text(cell))}{cell_close}'
+                for cell in cells
+            ])
+            xml_parts.append(f'{row_open}{row_cells}{row_close}' if row_cells
+                             else f'{row_open[:-1]}{row_close}')
         
         xml_parts.append(f'{indent}</table:table>')
         xml_parts.append(f'{indent}<text:p text:style-name="Normal"/>')
         
         text_after = item.get('text_after', '')
         if text_after:
-            processed_after = self.data_processor.replace_placeholders(str(text_after))
+            processed_after = self.data_processor.replace_placeholders(text_after)
             if processed_after.strip():
                 xml_parts.append(f'{indent}<text:p text:style-name="Normal">{GOSTSharedUtils.escape_xml(processed_after)}</text:p>')
     
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _image_meta(path: str) -> Tuple[str, str]:
+        """Хэш пути и расширение изображения (кэшируется для повторных путей)."""
+        image_ext = Path(path).suffix.lower() or '.png'
+        if image_ext not in _IMAGE_EXTENSIONS:
+            image_ext = '.png'
+        return hashlib.md5(path.encode()).hexdigest()[:8], image_ext
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _image_size(path: str) -> Optional[Tuple[int, int]]:
+        """Размеры изображения в пикселях или None, если их не удалось получить."""
+        try:
+            img_path_obj = Path(path)
+            if not (img_path_obj.exists() and img_path_obj.is_file()):
+                return None
+            size = _read_image_dims(path)
+            if size and size[0] > 0 and size[1] > 0:
+                return size
+            if not _HAS_PIL:
+                return None
+            # Редкие форматы (TIFF и т.п.) читаем через PIL
+            from PIL import Image
+            with Image.open(img_path_obj) as img:
+                return img.size
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _scaled_height(display_width: str, ratio: float) -> str:
+        """Высота как ширина, умноженная на ratio, в единицах ширины."""
+        match = _SIZE_RE.match(display_width)
+        if not match:
+            return ''
+        unit = match.group(2) or 'cm'
+        return f"{float(match.group(1)) * ratio:.2f}{unit}"
+    
+    def _fallback_height(self, display_width: str) -> str:
+        """Высота по умолчанию (пропорция 4:3)."""
+        return self._scaled_height(display_width, 0.75)
+    
+    def _compute_height_from_image(self, path: str, display_width: str) -> str:
+        """Высота по пропорциям файла изображения; '' при любой ошибке."""
+        try:
+            image_size = self._image_size(path)
+            if not image_size:
+                return ''
+            real_width, real_height = image_size
+            return self._scaled_height(display_width, real_height / real_width)
+        except Exception:
+            return ''
+    
     def _process_image(self, item: Dict, xml_parts: List[str], indent: str):
         """Обработка изображения."""
         if not hasattr(self, 'images'):
@@ -1358,7 +1904,7 @@ class GOSTSectionProcessor:
         
         # Формируем подпись для рисунка
         if caption:
-            processed_caption = self.data_processor.replace_placeholders(str(caption))
+            processed_caption = self.data_processor.replace_placeholders(caption)
             image_caption = f"Рисунок {self.image_counter} – {processed_caption}"
         else:
             image_caption = f"Рисунок {self.image_counter}"
@@ -1366,13 +1912,7 @@ class GOSTSectionProcessor:
         # Добавляем изображение
         if path:
             try:
-                import hashlib
-                path_hash = hashlib.md5(path.encode()).hexdigest()[:8]
-                image_ext = Path(path).suffix.lower() or '.png'
-                
-                if image_ext not in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif']:
-                    image_ext = '.png'
-                    
+                path_hash, image_ext = self._image_meta(path)
                 image_name = f"Pictures/image_{self.image_counter}_{path_hash}{image_ext}"
                 
                 # Получаем ширину и высоту из шаблона
@@ -1386,8 +1926,7 @@ class GOSTSectionProcessor:
                     if scale_factor is None:
                         scale_factor = self.image_scale
                     
-                    import re
-                    match = re.match(r'([\d.]+)(\D*)', str(size_str).strip())
+                    match = _SIZE_RE.match(str(size_str).strip())
                     if not match:
                         return size_str
                     
@@ -1414,54 +1953,25 @@ class GOSTSectionProcessor:
                     display_height = reduce_size(original_height)
                 else:
                     # Иначе вычисляем пропорционально
-                    try:
-                        from PIL import Image
-                        img_path_obj = Path(path)
-                        if img_path_obj.exists() and img_path_obj.is_file():
-                            with Image.open(img_path_obj) as img:
-                                real_width, real_height = img.size
-                                aspect_ratio = real_height / real_width
-                                
-                                match = re.match(r'([\d.]+)(\D*)', display_width)
-                                if match:
-                                    width_value = float(match.group(1))
-                                    unit = match.group(2) or 'cm'
-                                    height_value = width_value * aspect_ratio
-                                    display_height = f"{height_value:.2f}{unit}"
-                    except ImportError:
-                        match = re.match(r'([\d.]+)(\D*)', display_width)
-                        if match:
-                            width_value = float(match.group(1))
-                            unit = match.group(2) or 'cm'
-                            height_value = width_value * 0.75
-                            display_height = f"{height_value:.2f}{unit}"
-                    except Exception:
-                        match = re.match(r'([\d.]+)(\D*)', display_width)
-                        if match:
-                            width_value = float(match.group(1))
-                            unit = match.group(2) or 'cm'
-                            height_value = width_value * 0.75
-                            display_height = f"{height_value:.2f}{unit}"
+                    display_height = self._compute_height_from_image(path, display_width)
                 
                 # Если всё еще нет высоты, используем дефолтную пропорцию
-                if not display_height and display_width:
-                    match = re.match(r'([\d.]+)(\D*)', display_width)
-                    if match:
-                        width_value = float(match.group(1))
-                        unit = match.group(2) or 'cm'
-                        display_height = f"{width_value * 0.75:.2f}{unit}"
+                if not display_height:
+                    display_height = self._fallback_height(display_width)
                 
                 xml_parts.append(f'{indent}<text:p text:style-name="Normal"/>')
                 
-                xml_parts.append(f'{indent}<text:p text:style-name="Normal">')
-                xml_parts.append(f'{indent}  <draw:frame draw:name="Image{self.image_counter}" '
-                            f'svg:width="{display_width}" svg:height="{display_height}" '
-                            f'draw:style-name="GraphicsCenter" draw:z-index="0">')
-                xml_parts.append(f'{indent}    <draw:image xlink:href="{image_name}" '
-                            f'xlink:type="simple" xlink:show="embed" '
-                            f'xlink:actuate="onLoad"/>')
-                xml_parts.append(f'{indent}  </draw:frame>')
-                xml_parts.append(f'{indent}</text:p>')
+                xml_parts.append(
+                    f'{indent}<text:p text:style-name="Normal">\n'
+                    f'{indent}  <draw:frame draw:name="Image{self.image_counter}" '
+                    f'svg:width="{display_width}" svg:height="{display_height}" '
+                    f'draw:style-name="GraphicsCenter" draw:z-index="0">\n'
+                    f'{indent}    <draw:image xlink:href="{image_name}" '
+                    f'xlink:type="simple" xlink:show="embed" '
+                    f'xlink:actuate="onLoad"/>\n'
+                    f'{indent}  </draw:frame>\n'
+                    f'{indent}</text:p>'
+                )
                 
                 # Подпись под изображением
                 xml_parts.append(f'{indent}<text:p text:style-name="ImageCaptionCenter">{GOSTSharedUtils.escape_xml(image_caption)}</text:p>')
@@ -1506,6 +2016,19 @@ class GOSTDocumentStructure:
                                formatter,
                                title_page_callback: Optional[Callable[[Dict, List[str]], None]] = None) -> str:
         """Создает структуру контента документа."""
+        return '\n'.join(self.create_content_parts(
+            template, section_processor, toc_generator, formatter, title_page_callback))
+    
+    def create_content_parts(self, template: Dict, 
+                             section_processor: 'GOSTSectionProcessor',
+                             toc_generator: 'GOSTTOCGenerator',
+                             formatter,
+                             title_page_callback: Optional[Callable[[Dict, List[str]], None]] = None) -> List[str]:
+        """Создает фрагменты content.xml (строки без разделителей '\\n').
+        
+        Склеивать их не обязательно: DocumentBuilder пишет фрагменты
+        в архив пачками, не собирая документ в одну строку.
+        """
         xml_parts = GOSTSharedUtils.create_xml_header()
         
         xml_parts.append('  <office:automatic-styles>')
@@ -1513,10 +2036,7 @@ class GOSTDocumentStructure:
             xml_parts.append(formatter.get_styles_xml())
         xml_parts.append('  </office:automatic-styles>')
         
-        xml_parts.extend([
-            '  <office:body>',
-            '    <office:text>'
-        ])
+        xml_parts.extend(_XML_BODY_OPEN)
         
         # Сбрасываем счетчики в начале генерации документа
         if hasattr(section_processor, 'reset_document_counters'):
@@ -1536,10 +2056,14 @@ class GOSTDocumentStructure:
             section_processor.doc_type = toc_generator.doc_type
             self.doc_type = toc_generator.doc_type
         
-        # Собираем структуру для оглавления
+        # Собираем структуру для оглавления отдельным проходом до вывода:
+        # содержание стоит в начале документа и требует всех записей, а
+        # номера заголовков берутся из уже собранной структуры
         toc_generator.collect_toc_structure(sections)
         
         # Обрабатываем все секции
+        append = xml_parts.append
+        extend = xml_parts.extend
         for section in sections:
             section_id = section.get('id', '')
             
@@ -1547,35 +2071,34 @@ class GOSTDocumentStructure:
                 if title_page_callback:
                     title_page_callback(section, xml_parts)
                 else:
-                    xml_parts.append('      <!-- ========== ТИТУЛЬНЫЙ ЛИСТ ========== -->')
-                    xml_parts.append('      <text:p text:style-name="TitlePage">Титульный лист</text:p>')
+                    append(_XML_TITLE_PAGE_COMMENT)
+                    append('      <text:p text:style-name="TitlePage">Титульный лист</text:p>')
                 
                 # Разрыв страницы после титула
-                xml_parts.append('      <text:p text:style-name="PageBreak"/>')
+                append(_XML_PAGE_BREAK)
                 continue
                 
             elif section_id == "table_of_contents":
-                xml_parts.append('      <!-- ========== СОДЕРЖАНИЕ ========== -->')
+                append(_XML_TOC_COMMENT)
                 toc_title = "Содержание"
                 
                 # Генерируем оглавление
                 toc_xml = toc_generator.generate_toc_xml(toc_title)
-                xml_parts.extend(toc_xml)
+                extend(toc_xml)
                 
                 # ВСЕГДА разрыв страницы после содержания (по ГОСТ)
-                xml_parts.append('      <text:p text:style-name="PageBreak"/>')
+                append(_XML_PAGE_BREAK)
                 continue
                 
             elif section_id == "appendices":
                 # Обработка приложений из шаблона
-                xml_parts.append('      <!-- ========== ПРИЛОЖЕНИЯ ========== -->')
-                xml_parts.append('      <text:p text:style-name="PageBreak"/>')
+                extend(_XML_APPENDIX_OPEN)
                 
                 name = section.get('name', 'Приложения')
                 content = section.get('content', [])
                 
                 if name:
-                    xml_parts.append(f'      <text:p text:style-name="Heading_20_1">{GOSTSharedUtils.escape_xml(name)}</text:p>')
+                    append(f'      <text:p text:style-name="Heading_20_1">{GOSTSharedUtils.escape_xml(name)}</text:p>')
                 
                 for item in content:
                     section_processor._process_content_item(item, xml_parts, '      ')
@@ -1586,22 +2109,9 @@ class GOSTDocumentStructure:
                 # включая intro
                 section_processor.process_document_structure([section], xml_parts, toc_generator)
         
-        # Если в шаблоне нет секции приложений, добавляем заглушку
-        #if not any(section.get('id') == 'appendices' for section in sections):
-         #   xml_parts.extend([
-        #        '      <!-- ========== ПРИЛОЖЕНИЯ ========== -->',
-         #       '      <text:p text:style-name="PageBreak"/>',
-         #       '      <text:p text:style-name="Heading_20_1">Приложения</text:p>',
-          #      '      <text:p text:style-name="Normal">[Приложения будут добавлены здесь]</text:p>'
-          #  ])
-        
-        xml_parts.extend([
-            '    </office:text>',
-            '  </office:body>',
-            '</office:document-content>'
-        ])
+        extend(_XML_BODY_CLOSE)
         
-        return '\n'.join(xml_parts)
+        return xml_parts
 
 
 # ============================================================================
@@ -1614,9 +2124,9 @@ class GOSTValidator:
     def __init__(self):
         self.errors: List[str] = []
         self.warnings: List[str] = []
-        self._seen_ids = set()
+        self._seen_ids: Set[str] = set()
 
-    def validate(self, template: dict) -> bool:
+    def validate(self, template: Dict) -> bool:
         """
         Проверяет структуру шаблона документа.
         
@@ -1641,69 +2151,84 @@ class GOSTValidator:
         return not self.errors
 
     def _walk(self, node: Dict, path: List[str], level: int) -> None:
-        """Рекурсивно обходит структуру документа."""
-        node_id = node.get("id")
-        name = node.get("name")
-
-        # E5: уникальность id
-        if node_id:
-            if node_id in self._seen_ids:
-                self.errors.append(f"Дублирующий id: {node_id}")
-            self._seen_ids.add(node_id)
-
-        # Для intro не проверяем заголовок
-        if node_id != "intro" and (name is None or str(name).strip() == ""):
-            self.errors.append(
-                f"Отсутствует заголовок у узла "
-                f"{self._fmt_path(path, node_id)}"
-            )
+        """Обходит структуру документа без рекурсии (явный стек).
 
-        # Определяем дочерние узлы
-        children = []
-        for key in ['subsections', 'points', 'subpoints']:
-            if key in node and node[key] is not None:
-                children = node[key]
-                break
-        
-        # W2: одиночный пункт
-        if children and level >= 2 and len(children) == 1:
-            self.warnings.append(
-                f"'{name}' состоит из одного пункта "
-                f"(допустимо по ГОСТ 6.5.7)"
-            )
+        Порядок сообщений прежний: узел, затем все его потомки, затем blocks
+        узла - поэтому после потомков в стек кладется отметка для blocks.
+        """
+        stack: List[Tuple[Dict, Optional[List[str]], int]] = [(node, path, level)]
+        while stack:
+            node, path, level = stack.pop()
+            if path is None:
+                # Отметка: потомки узла проверены, осталось проверить его blocks
+                self._check_blocks(node)
+                continue
+            
+            node_id = node.get("id")
+            name = node.get("name")
 
-        # Рекурсия без ограничения глубины
-        for child in children:
-            self._walk(
-                child,
-                path + [name or node_id or "?"],
-                level + 1
-            )
-        
-        # Проверяем blocks если есть
-        if 'blocks' in node and node['blocks']:
-            blocks = node['blocks']
-            for block in blocks:
-                if not isinstance(block, dict):
-                    self.errors.append(f"Некорректный блок в узле {node_id}")
-                    continue
-                
-                # Проверяем текстовые блоки
-                if 'text' in block:
-                    text = block['text']
-                    if not isinstance(text, str) or not text.strip():
-                        self.warnings.append(f"Пустой текстовый блок в узле {node_id}")
-                
-                # Проверяем списки
-                elif 'list' in block:
-                    list_data = block['list']
-                    if not isinstance(list_data, dict):
-                        self.errors.append(f"Некорректный список в узле {node_id}")
-                        continue
-                    
-                    items = list_data.get('items', [])
-                    if not items:
-                        self.warnings.append(f"Пустой список в узле {node_id}")
+            # E5: уникальность id
+            if node_id:
+                if node_id in self._seen_ids:
+                    self.errors.append(f"Дублирующий id: {node_id}")
+                self._seen_ids.add(node_id)
+
+            # Для intro не проверяем заголовок
+            if node_id != "intro" and (name is None or str(name).strip() == ""):
+                self.errors.append(
+                    f"Отсутствует заголовок у узла "
+                    f"{self._fmt_path(path, node_id)}"
+                )
+
+            # Дочерние узлы - по первому имеющемуся ключу, как в _process_node
+            # и flatten_sections: проверяются те же узлы, что выводятся
+            if 'subsections' in node:
+                children = node['subsections']
+            elif 'points' in node:
+                children = node['points']
+            elif 'subpoints' in node:
+                children = node['subpoints']
+            else:
+                children = ()
+            
+            # W2: одиночный пункт
+            if children and level >= 2 and len(children) == 1:
+                self.warnings.append(
+                    f"'{name}' состоит из одного пункта "
+                    f"(допустимо по ГОСТ 6.5.7)"
+                )
+
+            # blocks проверяются после всех потомков, потомки - по порядку
+            if node.get('blocks'):
+                stack.append((node, None, level))
+            if children:
+                child_path = path + [name or node_id or "?"]
+                stack.extend((child, child_path, level + 1) for child in reversed(children))
+    
+    def _check_blocks(self, node: Dict) -> None:
+        """Проверяет blocks узла."""
+        node_id = node.get("id")
+        add_error = self.errors.append
+        add_warning = self.warnings.append
+        for block in node['blocks']:
+            if not isinstance(block, dict):
+                add_error(f"Некорректный блок в узле {node_id}")
+                continue
+            
+            # Проверяем текстовые блоки (ключ со значением None - тоже текстовый блок)
+            text = block.get('text', _MISSING)
+            if text is not _MISSING:
+                if not isinstance(text, str) or not text.strip():
+                    add_warning(f"Пустой текстовый блок в узле {node_id}")
+                continue
+            
+            # Проверяем списки
+            list_data = block.get('list', _MISSING)
+            if list_data is not _MISSING:
+                if not isinstance(list_data, dict):
+                    add_error(f"Некорректный список в узле {node_id}")
+                elif not list_data.get('items', []):
+                    add_warning(f"Пустой список в узле {node_id}")
 
     def _fmt_path(self, path: List[str], node_id: Optional[str]) -> str:
         """Форматирует путь для сообщений об ошибках."""
@@ -1727,6 +2252,116 @@ class GOSTValidator:
 # DOCUMENT BUILDER (БАЗОВЫЙ КЛАСС)
 # ============================================================================
 
+# Неизменяемые части ODT: собираются один раз при импорте, в документе
+# подставляются только поля страницы, заголовок и дата
+_ODT_STYLES_XML_TEMPLATE = string.Template('''<?xml version="1.0" encoding="UTF-8"?>
+    <office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+    xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
+    office:version="1.2">
+    <office:styles>
+        <style:style style:name="Standard" style:family="paragraph">
+        <style:text-properties fo:font-size="14pt"/>
+        </style:style>
+    </office:styles>
+    <office:automatic-styles>
+        <style:page-layout style:name="Mpm1">
+        <style:page-layout-properties 
+            fo:page-width="21.0cm" 
+            fo:page-height="29.7cm" 
+            fo:margin-top="${margin_top}" 
+            fo:margin-bottom="${margin_bottom}" 
+            fo:margin-left="${margin_left}" 
+            fo:margin-right="${margin_right}" 
+            style:writing-mode="lr-tb"/>
+        </style:page-layout>
+    </office:automatic-styles>
+    <office:master-styles>
+        <style:master-page style:name="Standard" style:page-layout-name="Mpm1">
+        <style:header/>
+        <style:footer/>
+        </style:master-page>
+    </office:master-styles>
+    </office:document-styles>''')
+
+_ODT_DEFAULT_STYLES_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+    <office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+    xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
+    office:version="1.2">
+    <office:styles>
+        <style:style style:name="Standard" style:family="paragraph">
+        <style:text-properties fo:font-size="14pt"/>
+        </style:style>
+    </office:styles>
+    </office:document-styles>'''
+
+_ODT_META_XML_TEMPLATE = string.Template('''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-meta xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+  xmlns:dc="http://purl.org/dc/elements/1.1/"
+  xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0"
+  office:version="1.2">
+  <office:meta>
+    <meta:generator>${generator}</meta:generator>
+    <dc:title>${title}</dc:title>
+    <dc:creator>${creator}</dc:creator>
+    <meta:creation-date>${date_str}</meta:creation-date>
+    <dc:date>${date_str}</dc:date>
+  </office:meta>
+</office:document-meta>''')
+
+_ODT_SETTINGS_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+    <office:document-settings xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">
+    <office:settings>
+        <config:config-item-set config:name="ooo:view-settings">
+        <config:config-item config:name="VisibleAreaTop" config:type="int">0</config:config-item>
+        <config:config-item config:name="VisibleAreaLeft" config:type="int">0</config:config-item>
+        <config:config-item config:name="VisibleAreaWidth" config:type="int">21000</config:config-item>
+        <config:config-item config:name="VisibleAreaHeight" config:type="int">29700</config:config-item>
+        </config:config-item-set>
+    </office:settings>
+    </office:document-settings>'''
+
+# Начало META-INF/manifest.xml: служебные файлы ODT
+_MANIFEST_HEADER: Tuple[str, ...] = (
+    '<?xml version="1.0" encoding="UTF-8"?>',
+    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0">',
+    '  <manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>',
+    '  <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>',
+    '  <manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>',
+    '  <manifest:file-entry manifest:full-path="meta.xml" manifest:media-type="text/xml"/>',
+    '  <manifest:file-entry manifest:full-path="settings.xml" manifest:media-type="text/xml"/>',
+    '  <manifest:file-entry manifest:full-path="Pictures/" manifest:media-type=""/>',
+)
+
+# MIME-типы изображений в манифесте (по умолчанию image/png)
+_IMAGE_MIME_TYPES: Dict[str, str] = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.svg': 'image/svg+xml',
+    '.tiff': 'image/tiff',
+    '.tif': 'image/tiff',
+    '.webp': 'image/webp',
+}
+
+# Уровень deflate для ODT: на content.xml РЭ (150 КБ) уровень 1 в 3 раза
+# быстрее уровня 6 по умолчанию (1.0 мс против 3.3 мс) при архиве 27 КБ вместо 20 КБ
+_ODT_COMPRESS_LEVEL = 1
+
+# Форматы изображений со своим сжатием: кладутся в архив без deflate
+_PRECOMPRESSED_IMAGE_EXTENSIONS = frozenset(('.png', '.jpg', '.jpeg', '.gif', '.webp'))
+
+# Фрагментов content.xml на одну запись в архив: одна склейка и кодирование
+# на пачку вместо одной строки на весь документ
+_CONTENT_CHUNK_PARTS = 4096
+
+
 class DocumentBuilder:
     """Базовый класс для построения и создания ODT документов."""
     
@@ -1746,6 +2381,10 @@ class DocumentBuilder:
         """Создание XML содержимого документа (абстрактный метод)."""
         raise NotImplementedError("Метод _create_content_xml должен быть реализован в подклассе")
     
+    def _create_content_parts(self, template: dict) -> List[str]:
+        """Фрагменты content.xml; подкласс может вернуть их без склейки."""
+        return [self._create_content_xml(template)]
+    
     def _get_metadata(self) -> Dict[str, str]:
         """Получение метаданных документа (абстрактный метод)."""
         raise NotImplementedError("Метод _get_metadata должен быть реализован в подклассе")
@@ -1756,18 +2395,21 @@ class DocumentBuilder:
             config_path = self.base_path / "docs/scripts/config_paths.yaml"
         
         if config_path and config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                return config if config else {}
+            config = GOSTSharedUtils.load_yaml_file(config_path)
+            return config if config else {}
         return {}
     
     def load_yaml_data(self, file_paths: List[Path]) -> Dict:
         """Загружает данные из YAML файлов."""
         return GOSTSharedUtils.load_yaml_data(file_paths)
     
-    def create_odt_file(self, content_xml: str, output_path: Optional[Path] = None, 
+    def create_odt_file(self, content_xml: Union[str, List[str]], output_path: Optional[Path] = None, 
                     metadata: Optional[Dict] = None) -> Path:
-        """Создает ODT файл."""
+        """Создает ODT файл.
+        
+        content_xml - готовая строка или список фрагментов, которые
+        соединяются через '\\n' прямо при записи в архив.
+        """
         if metadata is None:
             metadata = {}
         
@@ -1777,9 +2419,6 @@ class DocumentBuilder:
         images_to_add: List[Dict[str, Any]] = []
         if self.section_processor is not None and hasattr(self.section_processor, 'images'):
             images_to_add = self.section_processor.images
-
-            for i, img in enumerate(images_to_add):
-                print(f"   {i+1}. {img.get('path', 'Нет пути')} -> {img.get('name', 'Нет имени')}")
         
         odt_bytes = self._create_odt_bytes(content_xml, styles_xml, metadata, images_to_add)
         
@@ -1810,145 +2449,115 @@ class DocumentBuilder:
             except AttributeError:
                 pass
         
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-    <office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
-    xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
-    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
-    xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
-    office:version="1.2">
-    <office:styles>
-        <style:style style:name="Standard" style:family="paragraph">
-        <style:text-properties fo:font-size="14pt"/>
-        </style:style>
-    </office:styles>
-    <office:automatic-styles>
-        <style:page-layout style:name="Mpm1">
-        <style:page-layout-properties 
-            fo:page-width="21.0cm" 
-            fo:page-height="29.7cm" 
-            fo:margin-top="{margin_top}" 
-            fo:margin-bottom="{margin_bottom}" 
-            fo:margin-left="{margin_left}" 
-            fo:margin-right="{margin_right}" 
-            style:writing-mode="lr-tb"/>
-        </style:page-layout>
-    </office:automatic-styles>
-    <office:master-styles>
-        <style:master-page style:name="Standard" style:page-layout-name="Mpm1">
-        <style:header/>
-        <style:footer/>
-        </style:master-page>
-    </office:master-styles>
-    </office:document-styles>'''
+        return _ODT_STYLES_XML_TEMPLATE.substitute(
+            margin_top=margin_top,
+            margin_bottom=margin_bottom,
+            margin_left=margin_left,
+            margin_right=margin_right,
+        )
+        
+    @staticmethod
+    def _write_content_xml(zf: zipfile.ZipFile, content_xml: Union[str, List[str]]) -> None:
+        """Пишет content.xml в архив потоком, пачками по _CONTENT_CHUNK_PARTS фрагментов.
+        
+        В отладочном режиме те же байты параллельно скармливаются
+        инкрементальному парсеру lxml (если установлен), чтобы ошибки
+        ручного экранирования всплывали при сборке, а не в LibreOffice.
+        """
+        parser = None
+        if _HAS_LXML and logger.isEnabledFor(logging.DEBUG):
+            from lxml import etree
+            parser = etree.XMLParser(huge_tree=True)
+        
+        info = zipfile.ZipInfo('content.xml', date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zf.compression
+        with zf.open(info, 'w', force_zip64=True) as dest:
+            if isinstance(content_xml, str):
+                content_xml = [content_xml]
+            for start in range(0, len(content_xml), _CONTENT_CHUNK_PARTS):
+                chunk = '\n'.join(content_xml[start:start + _CONTENT_CHUNK_PARTS])
+                if start:
+                    chunk = '\n' + chunk
+                data = chunk.encode('utf-8')
+                dest.write(data)
+                if parser is not None:
+                    try:
+                        parser.feed(data)
+                    except etree.XMLSyntaxError as e:
+                        logger.warning("content.xml не является корректным XML: %s", e)
+                        parser = None
         
-    def _create_odt_bytes(self, content_xml: str, styles_xml: str, metadata: Dict, 
+        if parser is not None:
+            try:
+                parser.close()
+            except etree.XMLSyntaxError as e:
+                logger.warning("content.xml не является корректным XML: %s", e)
+    
+    def _create_odt_bytes(self, content_xml: Union[str, List[str]], styles_xml: str, metadata: Dict, 
                         images: Optional[List[Dict]] = None) -> bytes:
         """Создает байты ODT файла."""
         if images is None:
             images = []
         
-        print(f"🔍 Информация об изображениях:")
-        print(f"   Всего изображений: {len(images)}")
-        for i, img in enumerate(images):
-            print(f"   {i+1}. Путь: {img.get('path', 'Нет пути')}")
-            print(f"       Имя в архиве: {img.get('name', 'Нет имени')}")
-            print(f"       Подпись: {img.get('caption', 'Без подписи')}")
-            
-            # Проверяем существование файла
-            img_path = self.base_path / img.get('path', '')
-            if img_path.exists():
-                print(f"       ✅ Файл существует: {img_path}")
-                print(f"       📏 Размер: {img_path.stat().st_size} байт")
-            else:
-                print(f"       ❌ Файл НЕ найден: {img_path}")
+        # Подробности по изображениям - только в отладочном режиме
+        # (stat() файлов не выполняется, если DEBUG выключен)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Всего изображений: %d", len(images))
+            for i, img in enumerate(images, 1):
+                img_path = self.base_path / img.get('path', '')
+                logger.debug("%d. %s -> %s (%s), %s", i, img.get('path', 'Нет пути'),
+                             img.get('name', 'Нет имени'), img.get('caption', 'Без подписи'),
+                             f"{img_path.stat().st_size} байт" if img_path.exists() else "файл НЕ найден")
         
         current_date = datetime.now()
         date_str = current_date.strftime('%Y-%m-%dT%H:%M:%S')
         
         odt_files = {
             'mimetype': 'application/vnd.oasis.opendocument.text',
-            'content.xml': content_xml,
             'meta.xml': self._create_meta_xml(date_str, metadata),
             'styles.xml': styles_xml,
             'settings.xml': self._create_settings_xml()
         }
         
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_path = Path(tmpdir)
+        # Архив собирается в памяти: файлы пишутся напрямую, без временной папки
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=_ODT_COMPRESS_LEVEL) as zf:
+            zf.writestr("mimetype", odt_files['mimetype'], compress_type=zipfile.ZIP_STORED)
             
-            # Создаем папку для изображений
-            pictures_dir = tmp_path / "Pictures"
-            pictures_dir.mkdir(parents=True, exist_ok=True)
+            # content.xml - самый большой файл, пишется потоком из фрагментов
+            self._write_content_xml(zf, content_xml)
             
-            # Копируем изображения во временную директорию
+            for name in ("meta.xml", "styles.xml", "settings.xml"):
+                zf.writestr(name, odt_files[name])
+            
+            # Добавляем изображения прямо из исходных файлов
             for img_info in images:
                 try:
-                    # Определяем полный путь к исходному изображению
                     img_path = self.base_path / img_info['path']
                     if img_path.exists() and img_path.is_file():
-                        dest_path = tmp_path / img_info['name']
-                        dest_path.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(img_path, dest_path)
-
+                        # PNG/JPEG/GIF/WebP уже сжаты - deflate их почти не уменьшает
+                        compress_type = (zipfile.ZIP_STORED
+                                         if os.path.splitext(img_info['name'])[1].lower() in _PRECOMPRESSED_IMAGE_EXTENSIONS
+                                         else zipfile.ZIP_DEFLATED)
+                        zf.write(img_path, img_info['name'], compress_type=compress_type)
+                        logger.debug("Изображение добавлено в архив: %s", img_info['name'])
                     else:
                         print(f"⚠️ Изображение не найдено: {img_path}")
-                        # Создаем заглушку для отсутствующего изображения
-                        dest_path = tmp_path / img_info['name']
-                        dest_path.parent.mkdir(parents=True, exist_ok=True)
-                        self._create_image_placeholder(dest_path, img_info.get('caption', 'Изображение'))
+                        # Пустая заглушка, чтобы ссылка из content.xml оставалась валидной
+                        zf.writestr(img_info['name'], b'')
+                        print(f"📝 Создана пустая заглушка для: {img_info.get('caption', 'Изображение')}")
                 except Exception as e:
-                    print(f"⚠️ Ошибка при копировании изображения: {e}")
+                    print(f"⚠️ Ошибка при добавлении изображения: {e}")
                     import traceback
                     traceback.print_exc()
             
-            # Создаем основные файлы
-            for name, content in odt_files.items():
-                filepath = tmp_path / name
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(content)
-            
-            # Создаем META-INF и manifest.xml с изображениями
-            (tmp_path / "META-INF").mkdir(exist_ok=True)
-            with open(tmp_path / "META-INF" / "manifest.xml", 'w', encoding='utf-8') as f:
-                f.write(self._create_manifest_xml(images))
-            
-            # Создаем архив
-            output_path = tmp_path / "document.odt"
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                zf.writestr("mimetype", odt_files['mimetype'], compress_type=zipfile.ZIP_STORED)
-                
-                for file in ["content.xml", "meta.xml", "styles.xml", "settings.xml"]:
-                    zf.write(tmp_path / file, file)
-                
-                # Добавляем изображения
-                for img_info in images:
-                    img_file = tmp_path / img_info['name']
-                    if img_file.exists():
-                        zf.write(img_file, img_info['name'])
-                        print(f"✅ Изображение добавлено в архив: {img_info['name']}")
-                    else:
-                        print(f"❌ Изображение не найдено для архива: {img_file}")
-                
-                zf.write(tmp_path / "META-INF" / "manifest.xml", "META-INF/manifest.xml")
-            
-            # Проверяем размер архива
-            archive_size = output_path.stat().st_size
-            print(f"📦 Размер ODT архива: {archive_size} байт")
-            
-            with open(output_path, 'rb') as f:
-                return f.read()
+            zf.writestr("META-INF/manifest.xml", self._create_manifest_xml(images))
+        
+        odt_bytes = buffer.getvalue()
+        logger.debug("Размер ODT архива: %d байт", len(odt_bytes))
+        return odt_bytes
 
-    @staticmethod
-    def _create_image_placeholder(image_path: Path, caption: str):
-        """Создает заглушку для отсутствующего изображения."""
-        try:
-            # Просто создаем пустой файл с правильным расширением
-            with open(image_path, 'wb') as f:
-                f.write(b'')
-            print(f"📝 Создана пустая заглушка для: {caption}")
-        except Exception as e:
-            print(f"⚠️ Ошибка при создании заглушки: {e}")
-    
     def _generate_output_path(self) -> Path:
         """Генерирует путь для сохранения файла."""
         output_dir = self.base_path / "docs" / "output"
@@ -1964,18 +2573,7 @@ class DocumentBuilder:
     @staticmethod
     def _get_default_styles_xml() -> str:
         """Возвращает стили по умолчанию."""
-        return '''<?xml version="1.0" encoding="UTF-8"?>
-    <office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
-    xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
-    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
-    xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
-    office:version="1.2">
-    <office:styles>
-        <style:style style:name="Standard" style:family="paragraph">
-        <style:text-properties fo:font-size="14pt"/>
-        </style:style>
-    </office:styles>
-    </office:document-styles>'''
+        return _ODT_DEFAULT_STYLES_XML
     
     @staticmethod
     def _create_meta_xml(date_str: str, metadata: Dict) -> str:
@@ -1984,85 +2582,29 @@ class DocumentBuilder:
         creator = metadata.get('creator', 'Генератор документов')
         generator = metadata.get('generator', 'DocumentBuilder')
         
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-<office:document-meta xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
-  xmlns:dc="http://purl.org/dc/elements/1.1/"
-  xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0"
-  office:version="1.2">
-  <office:meta>
-    <meta:generator>{generator}</meta:generator>
-    <dc:title>{title}</dc:title>
-    <dc:creator>{creator}</dc:creator>
-    <meta:creation-date>{date_str}</meta:creation-date>
-    <dc:date>{date_str}</dc:date>
-  </office:meta>
-</office:document-meta>'''
+        return _ODT_META_XML_TEMPLATE.substitute(
+            generator=generator, title=title, creator=creator, date_str=date_str)
     
 
     @staticmethod
     def _create_manifest_xml(images: Optional[List[Dict]] = None) -> str:
-        """Создает XML манифеста."""
-        if images is None:
-            images = []
+        """Создает XML манифеста.
         
-        manifest_parts = [
-            '<?xml version="1.0" encoding="UTF-8"?>',
-            '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0">',
-            '  <manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>',
-            '  <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>',
-            '  <manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>',
-            '  <manifest:file-entry manifest:full-path="meta.xml" manifest:media-type="text/xml"/>',
-            '  <manifest:file-entry manifest:full-path="settings.xml" manifest:media-type="text/xml"/>',
-            '  <manifest:file-entry manifest:full-path="Pictures/" manifest:media-type=""/>'
+        Расширение берется через os.path.splitext: Path(name).suffix
+        строит объект пути на каждое изображение и в ~5 раз медленнее.
+        """
+        entries = [
+            f'  <manifest:file-entry manifest:full-path="{name}" '
+            f'manifest:media-type="{_IMAGE_MIME_TYPES.get(os.path.splitext(name)[1].lower(), "image/png")}"/>'
+            for name in (img_info.get('name', '') for img_info in images or ())
+            if name
         ]
-        
-        # Добавляем записи для изображений
-        for img_info in images:
-            img_name = img_info.get('name', '')
-            if img_name:
-                img_path = Path(img_name)
-                ext = img_path.suffix.lower()
-                
-                # Определяем MIME-тип
-                mime_map = {
-                    '.png': 'image/png',
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.gif': 'image/gif',
-                    '.bmp': 'image/bmp',
-                    '.svg': 'image/svg+xml',
-                    '.tiff': 'image/tiff',
-                    '.tif': 'image/tiff',
-                    '.webp': 'image/webp',
-                }
-                
-                mime_type = mime_map.get(ext, 'image/png')
-                
-                if not img_name.startswith('/'):
-                    img_name_with_slash = img_name
-                else:
-                    img_name_with_slash = img_name
-                    
-                manifest_parts.append(f'  <manifest:file-entry manifest:full-path="{img_name_with_slash}" manifest:media-type="{mime_type}"/>')
-        
-        manifest_parts.append('</manifest:manifest>')
-        return '\n'.join(manifest_parts)
+        return '\n'.join([*_MANIFEST_HEADER, *entries, '</manifest:manifest>'])
     
     @staticmethod
     def _create_settings_xml() -> str:
         """Создает XML для настроек."""
-        return '''<?xml version="1.0" encoding="UTF-8"?>
-    <office:document-settings xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
-    xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">
-    <office:settings>
-        <config:config-item-set config:name="ooo:view-settings">
-        <config:config-item config:name="VisibleAreaTop" config:type="int">0</config:config-item>
-        <config:config-item config:name="VisibleAreaLeft" config:type="int">0</config:config-item>
-        <config:config-item config:name="VisibleAreaWidth" config:type="int">21000</config:config-item>
-        <config:config-item config:name="VisibleAreaHeight" config:type="int">29700</config:config-item>
-        </config:config-item-set>
-    </office:settings>
-    </office:document-settings>'''
+        return _ODT_SETTINGS_XML
 
     def generate(self, output_path: Optional[Path] = None) -> Path:
         """
@@ -2083,22 +2625,15 @@ class DocumentBuilder:
         if self.section_processor is None:
             raise RuntimeError("section_processor не инициализирован")
             
-        template_path = self.get_template_path()
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = yaml.safe_load(f)
+        template = GOSTSharedUtils.load_yaml_file(self.get_template_path())
 
-        content_xml = self._create_content_xml(template)
+        content_xml = self._create_content_parts(template)
         metadata = self._get_metadata()
         
         if output_path is None:
             output_path = self._generate_output_path()
         
-        # Отладочная информация
-        print(f"📊 Статистика обработки:")
-        print(f"   Таблиц: {self.section_processor.table_counter}")
-        print(f"   Изображений: {len(self.section_processor.images)}")
-        for i, img in enumerate(self.section_processor.images):
-            print(f"   {i+1}. {img.get('caption', 'Без подписи')}")
-            print(f"       Путь: {img.get('path')}")
+        logger.debug("Таблиц: %d, изображений: %d", self.section_processor.table_counter,
+                     len(self.section_processor.images))
         
         return self.create_odt_file(content_xml, output_path, metadata)
\ No newline at end of file
@@ -2,73 +2,90 @@
 """
 protect_pdfs.py - Надёжная защита PDF через pdftoppm
 """
+import os
 import sys
 from pathlib import Path
+from typing import List, Tuple
 import tempfile
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-def protect_pdf(input_path: Path, output_path: Path, dpi: int = 150):
-    """PDF → JPEG → PDF с помощью pdftoppm"""
-    print(f"🔒 Защита {input_path.name}")
-    
-    temp_dir = Path(tempfile.mkdtemp())
-    
-    try:
-        # 1. Конвертируем PDF в JPEG
-        cmd = [
-            "pdftoppm", "-jpeg", "-jpegopt", "quality=95",
-            "-r", str(dpi), str(input_path), str(temp_dir / "page")
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        # Получаем JPEG файлы
-        jpegs = sorted(temp_dir.glob("page-*.jpg"))
-        if not jpegs:
-            print("❌ Не создано JPEG файлов")
-            return False
-            
-        print(f"   Страниц: {len(jpegs)}")
-        
-        # 2. Конвертируем JPEG в PDF
-        cmd = ["img2pdf", "--output", str(output_path)] + [str(j) for j in jpegs]
-        subprocess.run(cmd, check=True)
-        
-        # 3. Результат
-        size_mb = output_path.stat().st_size / 1024 / 1024
-        print(f"✅ Защищен ({size_mb:.1f} MB)")
-        return True
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Ошибка: {e.stderr.decode() if e.stderr else str(e)}")
-        return False
-    finally:
-        # Удаляем временные файлы
-        for jpeg in temp_dir.glob("*"):
-            jpeg.unlink()
-        temp_dir.rmdir()
+import img2pdf
+
+# Страницы одного PDF собираются img2pdf в этом же процессе, поэтому
+# одновременно обрабатываем не больше 4 файлов
+_MAX_WORKERS = 4
+
+
+def protect_pdf(input_path: Path, output_path: Path, dpi: int = 150) -> Tuple[bool, List[str]]:
+    """PDF → JPEG → PDF с помощью pdftoppm и img2pdf.
+
+    Возвращает (успех, строки отчета): функция работает в потоке пула,
+    а печатает отчет основной поток, чтобы строки разных файлов не смешивались.
+    """
+    report = [f"🔒 Защита {input_path.name}"]
+
+    with tempfile.TemporaryDirectory() as temp_name:
+        temp_dir = Path(temp_name)
+        try:
+            # 1. Конвертируем PDF в JPEG: page-1.jpg, page-2.jpg... (номера
+            # дополняются нулями до одной ширины, поэтому сортировка по имени верна)
+            cmd = [
+                "pdftoppm", "-jpeg", "-jpegopt", "quality=95",
+                "-r", str(dpi), str(input_path), str(temp_dir / "page")
+            ]
+
+            subprocess.run(cmd, capture_output=True, check=True)
+
+            jpegs = sorted(temp_dir.glob("page-*.jpg"))
+            if not jpegs:
+                report.append("❌ Не создано JPEG файлов")
+                return False, report
+
+            report.append(f"   Страниц: {len(jpegs)}")
+
+            # 2. Собираем PDF из JPEG без перекодирования
+            output_path.write_bytes(img2pdf.convert([str(jpeg) for jpeg in jpegs]))
+
+            # 3. Результат
+            size_mb = output_path.stat().st_size / 1024 / 1024
+            report.append(f"✅ Защищен ({size_mb:.1f} MB)")
+            return True, report
+
+        except subprocess.CalledProcessError as e:
+            report.append(f"❌ Ошибка: {e.stderr.decode(errors='replace').strip() if e.stderr else str(e)}")
+            return False, report
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
         print(f"📌 Использование: {sys.argv[0]} <входная_папка> <выходная_папка>")
         sys.exit(1)
-    
+
     src_dir = Path(sys.argv[1])
     dst_dir = Path(sys.argv[2])
-    
+
     if not src_dir.exists():
         print(f"❌ Папка не найдена: {src_dir}")
         sys.exit(1)
-    
+
     dst_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    # scandir отдает тип записи без отдельного stat и без Path на каждый файл
+    with os.scandir(src_dir) as entries:
+        pdfs = sorted(Path(entry.path) for entry in entries
+                      if entry.name.endswith(".pdf") and entry.is_file())
+    total = len(pdfs)
+
+    # Файлы независимы. Основное время - растеризация во внешнем pdftoppm,
+    # потоки ждут его без GIL; img2pdf.convert идет под GIL, но лишь
+    # упаковывает готовые JPEG. Число потоков ограничено памятью (_MAX_WORKERS)
+    workers = min(total, os.cpu_count() or 1, _MAX_WORKERS) or 1
     success = 0
-    total = 0
-    
-    for pdf in src_dir.glob("*.pdf"):
-        total += 1
-        if protect_pdf(pdf, dst_dir / pdf.name):
-            success += 1
-    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map отдает результаты в порядке файлов - отчеты печатаются целиком
+        for ok, report in executor.map(lambda pdf: protect_pdf(pdf, dst_dir / pdf.name), pdfs):
+            print("\n".join(report))
+            success += ok
+
     print(f"\n📊 Итого: {success}/{total} защищено")
-    sys.exit(0 if success == total else 1)
\ No newline at end of file
+    sys.exit(0 if success == total else 1)